@@ -1,17 +1,18 @@
 from machine import I2C, Pin
+import select
+import sys
 import time
 
+from kxtj3 import KXTJ3, CTRL_REG1, CTRL_REG2, DATA_CTRL_REG, WHO_AM_I
+
 # Configure I2C
 i2c = I2C(1, scl=Pin(18), sda=Pin(19), freq=400000)
 
 # Sensor address
 address = 0x0E
 
-# Register addresses
-CTRL_REG1 = 0x1B
-CTRL_REG2 = 0x1D
-DATA_CTRL_REG = 0x21
-WHO_AM_I = 0x0F
+# Sensor driver, keeps a shadow copy of the control registers
+sensor = KXTJ3(i2c, address)
 
 acc_range = {
     2: 0b11000000,
@@ -35,65 +36,319 @@ odr = {
     2048:0b00000111
 }
 
-def init_sensor(ctrl_reg1_value,data_ctrl_reg_value):
-    """Initialize the KXTJ3-1057 accelerometer sensor with given register values."""
-    # Write CTRL_REG1
-    i2c.writeto_mem(address, CTRL_REG1, bytes([0b00000000]))
-    time.sleep(0.2)
-    i2c.writeto_mem(address, DATA_CTRL_REG, bytes([data_ctrl_reg_value]))
-    time.sleep(0.2)
-    i2c.writeto_mem(address, CTRL_REG1, bytes([ctrl_reg1_value]))
+# Stream codecs understood by read_accel, in order of preference on the host
+CODECS = ('delta', 'pack', 'text')
+
+# Binary frame layout: magic, codec id, sample count, sequence number of the
+# first sample (u16 LE) and payload length (u16 LE), followed by the payload.
+FRAME_MAGIC = b'\xa5\x5a'
+FRAME_HEADER_LEN = 8
+CODEC_ID = {
+    'control': 0,
+    'pack': 1,
+    'delta': 2
+}
+
+# Full-scale value of each range, used to convert counts to g
+FULL_SCALE = {
+    2: 1.999,
+    4: 3.998,
+    8: 7.996,
+    16: 15.992
+}
+
+# Control commands are polled from stdin once every this many sensor reads
+COMMAND_POLL_INTERVAL = 32
+
+# Microseconds between command polls of the paced binary stream
+COMMAND_POLL_US = 20000
 
-    # # Write CTRL_REG2
-    # i2c.writeto_mem(address, CTRL_REG2, bytes([ctrl_reg2_value]))
+_poll = None
+_command = ''
+
+def init_sensor(ctrl_reg1_value,data_ctrl_reg_value):
+    """Initialize the KXTJ3-1057 accelerometer sensor with given register values.
 
-    # Short delay to apply settings
-    time.sleep(0.1)
+    Goes through standby only if the settings change and returns once the
+    first sample at the new settings is available (see KXTJ3.configure).
+    """
+    sensor.configure(ctrl_reg1_value, data_ctrl_reg_value)
 
 def check_who_am_i():
     """Check WHO_AM_I register to verify connection."""
-    who_am_i = i2c.readfrom_mem(address, WHO_AM_I, 1)[0]
+    who_am_i = sensor.who_am_i()
     if who_am_i == 0x35:
         return True
     else:
         return False
 
-def read_accel(scale_range):
-    if scale_range == 2:
-        scale_range = 1.999
-    elif scale_range == 4:
-        scale_range = 3.998
-    elif scale_range == 8:
-        scale_range = 7.996
-    elif scale_range == 16:
-        scale_range = 15.992
-    """Read acceleration data from the sensor and convert it to g values."""
+def is_configured(ctrl_reg1_value, data_ctrl_reg_value):
+    """Return True if the sensor is operating with the given register values.
+
+    The sensor keeps its registers across a soft reset of the board, so the
+    host can skip init_sensor when it resumes after a dropout.
+    """
+    return sensor.is_configured(ctrl_reg1_value, data_ctrl_reg_value)
+
+def codecs():
+    """Return the stream codecs supported by read_accel, separated by spaces."""
+    return ' '.join(CODECS)
+
+class FrameEncoder:
+    """
+    Builds one binary frame a sample at a time.
+
+    'pack' stores every axis as a 12-bit field (4.5 bytes per sample).
+    'delta' stores the first sample like 'pack' and every following axis as
+    the difference to the previous sample: '0' + 4 bits for -8..7,
+    '10' + 8 bits for -128..127, otherwise '11' + the 12-bit absolute value.
+    Fields are packed MSB first and the payload is padded to a whole byte.
+
+    stream_frames adds each sample right after reading it, so the encoding
+    work is the same in every output data period and only the header and
+    the write are left for the end of a frame.
+    """
+
+    def __init__(self, codec):
+        self.codec_id = CODEC_ID[codec]
+        self.delta = codec == 'delta'
+        self.start(0)
+
+    def start(self, seq):
+        """Begin a new frame whose first sample has sequence number seq."""
+        self.seq = seq
+        self.count = 0
+        self.buf = bytearray(FRAME_HEADER_LEN)
+        self.acc = 0
+        self.nbits = 0
+        self.prev = None
+
+    def add(self, s):
+        """Append one raw (x, y, z) sample to the frame."""
+        buf = self.buf
+        prev = self.prev
+        acc = self.acc
+        nbits = self.nbits
+        for i in range(3):
+            v = s[i]
+            if prev is None or not self.delta:
+                field = v & 0xFFF
+                width = 12
+            else:
+                d = v - prev[i]
+                if -8 <= d <= 7:
+                    field = d & 0xF
+                    width = 5
+                elif -128 <= d <= 127:
+                    field = 0x200 | (d & 0xFF)
+                    width = 10
+                else:
+                    field = 0x3000 | (v & 0xFFF)
+                    width = 14
+            acc = (acc << width) | field
+            nbits += width
+            while nbits >= 8:
+                nbits -= 8
+                buf.append((acc >> nbits) & 0xFF)
+            acc &= (1 << nbits) - 1
+        self.acc = acc
+        self.nbits = nbits
+        self.prev = s
+        self.count += 1
+
+    def finish(self):
+        """Pad the payload, fill in the header and return the frame."""
+        buf = self.buf
+        if self.nbits:
+            buf.append((self.acc << (8 - self.nbits)) & 0xFF)
+        length = len(buf) - FRAME_HEADER_LEN
+        buf[0] = FRAME_MAGIC[0]
+        buf[1] = FRAME_MAGIC[1]
+        buf[2] = self.codec_id
+        buf[3] = self.count
+        buf[4] = self.seq & 0xFF
+        buf[5] = (self.seq >> 8) & 0xFF
+        buf[6] = length & 0xFF
+        buf[7] = length >> 8
+        return buf
+
+def encode_frame(codec, samples, seq):
+    """
+    Encode a list of raw 12-bit (x, y, z) samples into one binary frame (see FrameEncoder).
+    """
+    encoder = FrameEncoder(codec)
+    encoder.start(seq)
+    for s in samples:
+        encoder.add(s)
+    return encoder.finish()
+
+def encode_control(message):
+    """Encode a control message (e.g. a configuration acknowledgement) as a frame."""
+    payload = message.encode()
+    buf = bytearray(FRAME_MAGIC)
+    buf.extend(bytes([CODEC_ID['control'], 0, 0, 0, len(payload) & 0xFF, len(payload) >> 8]))
+    buf.extend(payload)
+    return buf
+
+def poll_command():
+    """
+    Return a complete command line received on stdin, or None.
+
+    Never blocks: only characters already waiting are consumed, and a
+    partial line is kept until its newline arrives.
+    """
+    global _poll, _command
+    if _poll is None:
+        _poll = select.poll()
+        _poll.register(sys.stdin, select.POLLIN)
+    while _poll.poll(0):
+        c = sys.stdin.read(1)
+        if c == '\n' or c == '\r':
+            line = _command
+            _command = ''
+            if line:
+                return line
+        else:
+            _command += c
+    return None
+
+def apply_command(line):
+    """
+    Apply an in-band control command while streaming.
+
+    Supported command: 'cfg <range> <odr>', where range is a key of acc_range
+    and odr a key of odr. The sensor is re-initialized in place.
+
+    Returns:
+        The new (range, odr) tuple, or None if the command was not understood.
+    """
+    parts = line.split()
+    if len(parts) != 3 or parts[0] != 'cfg':
+        return None
+    try:
+        new_range = int(parts[1])
+        new_odr = int(parts[2])
+        init_sensor(acc_range[new_range], odr[new_odr])
+    except (ValueError, KeyError):
+        return None
+    return new_range, new_odr
+
+def read_raw():
+    """Read one (x, y, z) sample as signed 12-bit counts."""
+    return sensor.read_raw()
+
+def stream_frames(codec, frame_len=32):
+    """
+    Stream raw samples as binary frames on stdout.
+
+    Reads are paced at the output data rate on the board's clock and the
+    sequence number counts output data periods, so every sample is sent,
+    a sensor at rest shows up as repeated values and a period without a
+    read as a skipped sequence number. A frame only holds consecutive
+    periods. Each sample is encoded right after its read, so no period
+    carries the encoding of a whole frame.
+    Scaling to g is left to the host, which knows the selected range.
+    Range/ODR changes requested in-band are acknowledged with a control frame.
+    """
+    out = sys.stdout.buffer
+    period = int(1000000 / sensor.odr_hz())
+    due = time.ticks_us()
+    polled = due
+    tick = 0
+    frame = FrameEncoder(codec)
+    while True:
+        if time.ticks_diff(time.ticks_us(), polled) >= COMMAND_POLL_US:
+            polled = time.ticks_us()
+            line = poll_command()
+            if line is not None:
+                # Flush so every sample before the acknowledgement uses the old range
+                if frame.count:
+                    out.write(frame.finish())
+                    frame.start(tick)
+                config = apply_command(line)
+                if config is not None:
+                    out.write(encode_control('cfg %d %d' % config))
+                    period = int(1000000 / sensor.odr_hz())
+                due = time.ticks_us()
+        wait = time.ticks_diff(due, time.ticks_us())
+        if wait > 0:
+            time.sleep_us(wait)
+        elif wait <= -period:
+            # Whole periods passed without a read: their samples are lost
+            late = -wait // period
+            tick = (tick + late) & 0xFFFF
+            due = time.ticks_add(due, late * period)
+        sample = read_raw()
+        if frame.count and tick != (frame.seq + frame.count) & 0xFFFF:
+            out.write(frame.finish())
+            frame.start(tick)
+        if not frame.count:
+            frame.seq = tick
+        frame.add(sample)
+        tick = (tick + 1) & 0xFFFF
+        due = time.ticks_add(due, period)
+        if frame.count >= frame_len:
+            out.write(frame.finish())
+            frame.start(tick)
+
+def bench_codec(n=256):
+    """
+    Measure bytes per sample and encoding time for every binary codec.
+
+    Reads n live samples from the sensor first so the deltas are realistic.
+    """
+    samples = []
+    prev = None
+    while len(samples) < n:
+        sample = read_raw()
+        if sample != prev:
+            samples.append(sample)
+            prev = sample
+    for codec in ('pack', 'delta'):
+        t0 = time.ticks_us()
+        size = 0
+        for i in range(0, n, 32):
+            size += len(encode_frame(codec, samples[i:i + 32], i))
+        dt = time.ticks_diff(time.ticks_us(), t0)
+        print(codec, size / n, 'bytes/sample', dt / n, 'us/sample')
+
+def read_accel(scale_range, codec='text', start_delay=2):
+    """
+    Read acceleration data from the sensor and convert it to g values.
+
+    Streaming starts after start_delay seconds; the host passes 0 when it
+    resumes after a dropout.
+
+    While streaming, 'cfg <range> <odr>' lines on stdin re-initialize the
+    sensor without leaving the loop; the text stream acknowledges them with
+    a '#cfg <range> <odr>' line.
+    """
+    scale_range = FULL_SCALE.get(scale_range, scale_range)
     # Read 6 bytes of acceleration data
-    time.sleep(2)
+    time.sleep(start_delay)
+
+    # Binary codecs send raw counts; the host converts them to g
+    if codec != 'text':
+        stream_frames(codec)
 
     # Store previous values
     prev_x, prev_y, prev_z = None, None, None
+    reads = 0
 
     while True:
-        data = i2c.readfrom_mem(address, 0x06, 6)
-
-        # Combine bytes to form 16-bit raw values
-        x_raw = (data[1] << 8) | data[0]
-        y_raw = (data[3] << 8) | data[2]
-        z_raw = (data[5] << 8) | data[4]
-
-        # Convert to 12-bit values by shifting
-        x = x_raw >> 4
-        y = y_raw >> 4
-        z = z_raw >> 4
-
-        # Handle negative values using two's complement
-        if x & 0x800:
-            x -= 0x1000
-        if y & 0x800:
-            y -= 0x1000
-        if z & 0x800:
-            z -= 0x1000
+        reads += 1
+        if reads >= COMMAND_POLL_INTERVAL:
+            reads = 0
+            line = poll_command()
+            if line is not None:
+                config = apply_command(line)
+                if config is not None:
+                    scale_range = FULL_SCALE[config[0]]
+                    print('#cfg %d %d' % config)
+                prev_x, prev_y, prev_z = None, None, None
+
+        # Read one burst of X, Y and Z as signed 12-bit counts
+        x, y, z = sensor.read_raw()
 
         # Convert to acceleration in g
         sensitivity = scale_range / 2048  # حساسیت بر اساس رنج انتخابی
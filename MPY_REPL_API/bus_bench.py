@@ -0,0 +1,268 @@
+"""
+bus_bench.py
+
+This module runs the MicroPython driver (API.py and kxtj3.py) under CPython
+against a `machine` shim whose I2C bus is a FakeI2C on a virtual clock, and
+a `time` shim on the same clock, and measures whether a read strategy keeps
+up with the sensor. Every I2C transaction costs its bus time at the
+configured clock frequency plus a fixed software overhead, and every sample
+delivered costs a processing time. The 'stream' strategy runs the device's
+own API.stream_frames loop with stdout going to a sink, charging an encode
+time per field and a write time per frame instead. All overheads are
+assumptions to calibrate on the board (e.g. with API.bench_codec). For each
+ODR, bus speed and read strategy the harness reports the delivered sample
+rate, the rate the loop could sustain, bus utilization and the share of
+samples lost.
+"""
+
+import sys
+import types
+
+from fake_i2c import FakeI2C, VirtualClock
+
+# Read strategies compared by the benchmark
+STRATEGIES = ('single', 'burst', 'buffer', 'stream')
+
+
+class StreamEnd(Exception):
+    """
+    Raised by StreamSink to leave API.stream_frames once the simulated time is up.
+    """
+
+
+class StreamSink:
+    """
+    Stands in for sys.stdout.buffer of the board: parses the binary frames
+    written by API.stream_frames, charges the write time and ends the stream
+    at a deadline.
+    """
+
+    def __init__(self, clock: VirtualClock, end_us: float, write_us: float = 0.0):
+        self.clock = clock
+        self.end_us = end_us
+        self.write_us = write_us
+        self.frames = 0
+        self.samples = 0
+        self.skipped = 0  # Sequence numbers missing between frames
+        self.next_seq = None
+
+    def write(self, data) -> int:
+        self.clock.advance(self.write_us)
+        if data[2]:
+            n, seq = data[3], data[4] | (data[5] << 8)
+            if self.next_seq is not None:
+                self.skipped += (seq - self.next_seq) & 0xFFFF
+            self.next_seq = (seq + n) & 0xFFFF
+            self.frames += 1
+            self.samples += n
+        if self.clock.now_us >= self.end_us:
+            raise StreamEnd()
+        return len(data)
+
+
+class NoInput:
+    """
+    Stands in for the stdin poller of API.poll_command: no command ever arrives.
+    """
+
+    def poll(self, timeout=0) -> list:
+        return []
+
+
+def install_machine(clock: VirtualClock, overhead_us: float = 0.0) -> types.ModuleType:
+    """
+    Register a `machine` module whose I2C is a FakeI2C on the given clock.
+
+    Parameters:
+        clock (VirtualClock): Time base shared by the bus, the sensor and the driver.
+        overhead_us (float): Software overhead charged per I2C transaction.
+
+    Returns:
+        module: The shim, also placed in sys.modules['machine'].
+    """
+    machine = types.ModuleType('machine')
+
+    class I2C(FakeI2C):
+        def __init__(self, id=0, scl=None, sda=None, freq=400000):
+            super().__init__(freq, clock=clock, overhead_us=overhead_us)
+
+    class Pin:
+        def __init__(self, id, *args, **kwargs):
+            self.id = id
+
+    machine.I2C = I2C
+    machine.Pin = Pin
+    sys.modules['machine'] = machine
+    return machine
+
+
+def make_time(clock: VirtualClock) -> types.ModuleType:
+    """
+    Return a `time` module for API.py whose ticks and sleeps run on the given clock.
+
+    It is assigned to the module's global instead of sys.modules so CPython
+    code keeps the real time module.
+    """
+    shim = types.ModuleType('time')
+    shim.ticks_us = clock.ticks_us
+    shim.ticks_add = clock.ticks_add
+    shim.ticks_diff = clock.ticks_diff
+    shim.sleep_us = clock.sleep_us
+    shim.sleep_ms = clock.sleep_ms
+    shim.sleep = clock.sleep
+    return shim
+
+
+def load_api(clock: VirtualClock, overhead_us: float = 0.0):
+    """
+    Import a fresh copy of API.py on the shims, with the driver and the
+    module's own time calls on the virtual clock.
+
+    Returns:
+        module: The API module.
+    """
+    install_machine(clock, overhead_us)
+    sys.modules.pop('API', None)
+    import API
+    API.sensor.clock = clock
+    API.time = make_time(clock)
+    return API
+
+
+def _read_single(api):
+    """One transaction per axis (2 bytes each), as a register-at-a-time driver would."""
+    i2c, sensor = api.i2c, api.sensor
+    for reg in (0x06, 0x08, 0x0A):
+        i2c.readfrom_mem(sensor.address, reg, 2)
+
+
+def _run_stream(api, clock: VirtualClock, seconds: float, codec: str, field_us: float, write_us: float) -> StreamSink:
+    """
+    Run API.stream_frames for the given simulated time, charging the encode
+    time of every field as FrameEncoder adds it.
+    """
+    class FrameEncoder(api.FrameEncoder):
+        def add(self, s):
+            super().add(s)
+            clock.advance(3 * field_us)
+
+    sink = StreamSink(clock, clock.now_us + seconds * 1e6, write_us)
+    api.FrameEncoder = FrameEncoder
+    api.sys = types.SimpleNamespace(stdout=types.SimpleNamespace(buffer=sink), stdin=None)
+    api._poll = NoInput()
+    try:
+        api.stream_frames(codec)
+    except StreamEnd:
+        pass
+    return sink
+
+
+def run(odr_key: int, freq: int, strategy: str, seconds: float = 1.0, overhead_us: float = 25.0,
+        process_us: float = 50.0, batch: int = 32, codec: str = 'delta', field_us: float = 30.0,
+        write_us: float = 300.0) -> dict:
+    """
+    Stream for the given simulated time with one read strategy and collect the statistics.
+
+    Parameters:
+        odr_key (int): Key of API.odr.
+        freq (int): I2C clock in Hz.
+        strategy (str): 'single' (a transaction per axis, free-running),
+            'burst' (API.read_raw: one 6-byte transaction, free-running as in
+            the text loop of API.read_accel), 'buffer' (KXTJ3.read_samples: batches
+            paced at the ODR into a preallocated buffer, processed after
+            each batch) or 'stream' (API.stream_frames itself).
+        seconds (float): Simulated streaming time.
+        overhead_us (float): Software overhead per I2C transaction.
+        process_us (float): Processing time per delivered sample (decode, encode, output).
+        batch (int): Samples per read_samples call for 'buffer'.
+        codec (str): Frame codec for 'stream'.
+        field_us (float): Encode time per field for 'stream' (three per sample).
+        write_us (float): Time per frame written to stdout for 'stream'.
+
+    Returns:
+        dict: 'odr_hz', 'freq', 'strategy', 'delivered_hz', 'capacity_hz'
+        (samples per second the loop could handle), 'bus_utilization',
+        'dropped_fraction', 'transactions_per_sample' and, for 'stream',
+        'skipped_seq' (sequence numbers missing from the frames).
+    """
+    if strategy not in STRATEGIES:
+        raise ValueError(f"Unknown read strategy: {strategy}")
+    clock = VirtualClock()
+    api = load_api(clock, overhead_us)
+    i2c, sensor, device = api.i2c, api.sensor, api.i2c.device
+    i2c.freq = freq
+    api.init_sensor(api.acc_range[2], api.odr[odr_key])
+    odr_hz = sensor.odr_hz()
+    buf = bytearray(6 * batch)
+
+    i2c.reset_counters()
+    start_us = clock.now_us
+    first = None
+    last = device.last_read
+    delivered = 0
+    skipped = None
+    if strategy == 'stream':
+        before, dropped_before = device.samples_read, device.dropped
+        sink = _run_stream(api, clock, seconds, codec, field_us, write_us)
+        delivered, skipped = sink.samples, sink.skipped
+        if device.samples_read > before:
+            # Samples the sensor produced from the first read on
+            first, last = 0, device.samples_read - before + device.dropped - dropped_before - 1
+    while strategy != 'stream' and clock.now_us - start_us < seconds * 1e6:
+        if strategy == 'buffer':
+            before = device.samples_read
+            sensor.read_samples(batch, buf)
+            new = device.samples_read - before
+        else:
+            if strategy == 'single':
+                _read_single(api)
+            else:
+                api.read_raw()
+            new = 1 if device.last_read != last else 0
+        if device.last_read is not None and first is None:
+            first = device.last_read - new + 1
+        last = device.last_read
+        delivered += new
+        clock.advance(new * process_us)
+    elapsed = (clock.now_us - start_us) / 1e6
+
+    produced = last - first + 1 if first is not None else 0
+    per_read_us = i2c.bus_us / i2c.transactions + overhead_us if i2c.transactions else 0.0
+    transactions_per_sample = {'single': 3, 'burst': 1, 'buffer': 1, 'stream': 1}[strategy]
+    if strategy == 'stream':
+        sample_us = per_read_us + 3 * field_us + write_us / 32
+    else:
+        sample_us = transactions_per_sample * per_read_us + process_us
+    return {
+        'odr_hz': odr_hz,
+        'freq': freq,
+        'strategy': strategy,
+        'delivered_hz': delivered / elapsed,
+        'capacity_hz': 1e6 / sample_us,
+        'bus_utilization': i2c.bus_us / (elapsed * 1e6),
+        'dropped_fraction': (produced - delivered) / produced if produced else 0.0,
+        'transactions_per_sample': i2c.transactions / delivered if delivered else None,
+        'skipped_seq': skipped
+    }
+
+
+def benchmark(odrs=(512, 1024, 2048), freqs=(100000, 400000, 1000000), strategies=STRATEGIES, **kwargs) -> list:
+    """
+    Run every combination of ODR, bus speed and read strategy.
+
+    Returns:
+        list: Result dictionaries of run().
+    """
+    return [run(odr_key, freq, strategy, **kwargs) for odr_key in odrs for freq in freqs for strategy in strategies]
+
+
+if __name__ == '__main__':
+    print('assumed overhead: 25 us per I2C transaction, 50 us processing per sample; '
+          'stream: 30 us encode per field, 300 us per frame write')
+    print(f"{'ODR Hz':>7} {'bus kHz':>7} {'strategy':>8} {'delivered Hz':>12} {'capacity Hz':>11} "
+          f"{'bus use':>7} {'dropped':>7} {'I2C/sample':>10}")
+    for r in benchmark():
+        tps = r['transactions_per_sample']
+        print(f"{r['odr_hz']:7g} {r['freq'] / 1000:7g} {r['strategy']:>8} {r['delivered_hz']:12.1f} "
+              f"{r['capacity_hz']:11.1f} {r['bus_utilization']:7.1%} {r['dropped_fraction']:7.1%} "
+              f"{tps if tps is None else round(tps, 2):>10}")
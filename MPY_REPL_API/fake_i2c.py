@@ -0,0 +1,403 @@
+"""
+fake_i2c.py
+
+This module provides CPython stand-ins for the I2C bus and the KXTJ3-1057,
+used to test and benchmark kxtj3.py without hardware. FakeI2C charges each
+transaction its bus time (9 clocks per byte plus start, repeated start and
+stop conditions at the bus frequency) on a VirtualClock and counts
+transactions and bytes. FakeKXTJ3 models the sensor registers: settings
+only change in standby, samples appear at the output data rate after the
+turn-on time, and samples overwritten before they were read are counted.
+Running the module checks the driver and compares it with the old
+init_sensor sequences.
+"""
+
+import os
+
+import kxtj3
+from kxtj3 import KXTJ3, CTRL_REG1, CTRL_REG2, DATA_CTRL_REG, WHO_AM_I, XOUT_L, PC1, SRST
+
+# Registers that may only be written in standby
+STANDBY_ONLY = (CTRL_REG2, 0x1E, 0x1F, DATA_CTRL_REG, 0x29, 0x6A, 0x6B)
+
+# Project folders (relative to the repository root) that carry a copy of kxtj3.py
+DRIVER_COPIES = ('driver/driver', 'driverAndLog')
+
+# Time the simulated sensor takes to finish a software reset
+RESET_US = 2000
+
+# Start-up time of the simulated sensor, from PC1 = 1 to the first valid
+# sample, per DATA_CTRL_REG value in microseconds. Deliberately a table of
+# its own rather than kxtj3.py's wait formula, so check_driver fails if the
+# driver waits too little; keep it in line with the datasheet's start-up
+# time table.
+START_UP_US = {
+    0x08: 1281000, 0x09: 641000, 0x0A: 321000, 0x0B: 161000,
+    0x00: 81000, 0x01: 41000, 0x02: 21000, 0x03: 11000,
+    0x04: 6000, 0x05: 3500, 0x06: 2300, 0x07: 1700
+}
+
+
+class VirtualClock:
+    """
+    Simulated time with the subset of MicroPython's time module used by the driver.
+    """
+
+    def __init__(self):
+        self.now_us = 0.0
+        self.slept_us = 0.0  # Total time spent in sleep_us
+
+    def ticks_us(self) -> int:
+        return int(self.now_us)
+
+    def ticks_add(self, ticks: int, delta: int) -> int:
+        return ticks + delta
+
+    def ticks_diff(self, a: int, b: int) -> int:
+        return a - b
+
+    def sleep_us(self, us: float):
+        if us > 0:
+            self.now_us += us
+            self.slept_us += us
+
+    def sleep_ms(self, ms: float):
+        self.sleep_us(ms * 1000)
+
+    def sleep(self, s: float):
+        self.sleep_us(s * 1000000)
+
+    def advance(self, us: float):
+        """Let time pass without sleeping, e.g. for bus transfers or computation."""
+        self.now_us += us
+
+
+class FakeKXTJ3:
+    """
+    Register model of the KXTJ3-1057.
+    """
+
+    def __init__(self, clock: VirtualClock):
+        """
+        Initialize the FakeKXTJ3 instance in its power-on state.
+
+        Parameters:
+            clock (VirtualClock): Time base for sample generation.
+        """
+        self.clock = clock
+        self.rejected_writes = 0  # Settings written while operating, which the sensor ignores
+        self.invalid_reads = 0  # Data read before the first sample after turn-on
+        self.repeated_reads = 0  # Data read again before a new sample was ready
+        self.dropped = 0  # Samples replaced by a newer one before they were read
+        self.samples_read = 0
+        self.power_on()
+
+    def power_on(self):
+        """Return the registers to their power-on values."""
+        self.regs = bytearray(0x80)
+        self.regs[WHO_AM_I] = 0x35
+        self.regs[DATA_CTRL_REG] = 0x02  # 50 Hz
+        self.operating_since = None
+        self.reset_until = None
+        self.produced = 0
+        self.last_read = None
+
+    def odr_hz(self) -> float:
+        return kxtj3.ODR_HZ.get(self.regs[DATA_CTRL_REG] & 0x0F, 50)
+
+    def turn_on_us(self) -> float:
+        """Time from PC1 = 1 to the first sample."""
+        return START_UP_US.get(self.regs[DATA_CTRL_REG] & 0x0F, START_UP_US[0x02])
+
+    def _update(self):
+        """Produce the samples due up to the current time."""
+        now = self.clock.now_us
+        if self.reset_until is not None and now >= self.reset_until:
+            self.power_on()
+        if self.operating_since is None:
+            return
+        first = self.operating_since + self.turn_on_us()
+        if now >= first:
+            self.produced = int((now - first) * self.odr_hz() / 1e6) + 1
+
+    def _sample(self, index: int) -> tuple:
+        """Return sample index as (x, y, z) counts: a slow wobble and 1 g on Z."""
+        lsb = 1024 >> ((self.regs[CTRL_REG1] >> 3) & 0x03)
+        wobble = (index * 7) % 64 - 32
+        return wobble, -wobble, lsb
+
+    def _latch(self):
+        """Load the newest sample into the output registers for a data read."""
+        self._update()
+        if self.produced == 0:
+            self.invalid_reads += 1
+            return
+        index = self.produced - 1
+        if index == self.last_read:
+            self.repeated_reads += 1
+            return
+        if self.last_read is not None:
+            self.dropped += index - self.last_read - 1
+        self.last_read = index
+        self.samples_read += 1
+        for i, v in enumerate(self._sample(index)):
+            raw = (v & 0xFFF) << 4
+            self.regs[XOUT_L + 2 * i] = raw & 0xFF
+            self.regs[XOUT_L + 2 * i + 1] = raw >> 8
+
+    def write(self, reg: int, data: bytes):
+        """Handle a register write with auto-increment."""
+        self._update()
+        for value in data:
+            operating = self.regs[CTRL_REG1] & PC1
+            if reg == CTRL_REG1:
+                if operating and value & PC1 and (value ^ self.regs[CTRL_REG1]) & ~PC1 & 0xFF:
+                    # Settings only change together with or after entering standby
+                    self.rejected_writes += 1
+                    value = (self.regs[CTRL_REG1] & ~PC1 & 0xFF) | (value & PC1)
+                if value & PC1 and not operating:
+                    self.operating_since = self.clock.now_us
+                    self.produced = 0
+                    self.last_read = None
+                elif not value & PC1:
+                    self.operating_since = None
+                self.regs[reg] = value
+            elif reg == CTRL_REG2 and value & SRST:
+                # Software reset works in either mode
+                self.regs[reg] = value
+                self.reset_until = self.clock.now_us + RESET_US
+            elif reg in STANDBY_ONLY and operating:
+                self.rejected_writes += 1
+            elif reg != WHO_AM_I:
+                self.regs[reg] = value
+            reg += 1
+
+    def read(self, reg: int, n: int) -> bytes:
+        """Handle a register read with auto-increment."""
+        if reg <= XOUT_L + 5 and reg + n > XOUT_L:
+            self._latch()
+        else:
+            self._update()
+        return bytes(self.regs[reg:reg + n])
+
+
+class FakeI2C:
+    """
+    Simulated I2C bus with the memory methods of machine.I2C and bus-time accounting.
+    """
+
+    def __init__(self, freq: int = 400000, device: FakeKXTJ3 = None, address: int = 0x0E,
+                 clock: VirtualClock = None, overhead_us: float = 0.0):
+        """
+        Initialize the FakeI2C instance.
+
+        Parameters:
+            freq (int): Bus clock in Hz.
+            device (FakeKXTJ3): Sensor on the bus; a new one if None.
+            address (int): Address the sensor answers to.
+            clock (VirtualClock): Time base; the device's clock if None.
+            overhead_us (float): Software overhead charged per transaction, in
+                microseconds (call overhead of the I2C driver on the board).
+        """
+        self.clock = clock or (device.clock if device else VirtualClock())
+        self.device = device or FakeKXTJ3(self.clock)
+        self.address = address
+        self.freq = freq
+        self.overhead_us = overhead_us
+        self.reset_counters()
+
+    def reset_counters(self):
+        self.transactions = 0
+        self.bytes = 0
+        self.bus_us = 0.0  # Time the bus was busy
+
+    def _transfer(self, address: int, nbytes: int, restart: bool):
+        """Charge one transaction of nbytes bytes including the address byte(s)."""
+        bits = 9 * nbytes + 2 + (1 if restart else 0)
+        us = bits * 1e6 / self.freq
+        self.clock.advance(us + self.overhead_us)
+        self.transactions += 1
+        self.bytes += nbytes
+        self.bus_us += us
+        if address != self.address:
+            raise OSError(19, 'ENODEV')
+
+    def writeto_mem(self, addr: int, memaddr: int, buf):
+        self._transfer(addr, 2 + len(buf), False)
+        self.device.write(memaddr, bytes(buf))
+
+    def readfrom_mem(self, addr: int, memaddr: int, nbytes: int) -> bytes:
+        self._transfer(addr, 3 + nbytes, True)
+        return self.device.read(memaddr, nbytes)
+
+    def readfrom_mem_into(self, addr: int, memaddr: int, buf):
+        self._transfer(addr, 3 + len(buf), True)
+        buf[:] = self.device.read(memaddr, len(buf))
+
+    def scan(self) -> list:
+        return [self.address]
+
+
+def legacy_init(i2c: FakeI2C, clock: VirtualClock, ctrl_reg1_value: int, data_ctrl_reg_value: int):
+    """The init_sensor sequence API.py used before the KXTJ3 driver."""
+    i2c.writeto_mem(0x0E, CTRL_REG1, bytes([0]))
+    clock.sleep(0.2)
+    i2c.writeto_mem(0x0E, DATA_CTRL_REG, bytes([data_ctrl_reg_value]))
+    clock.sleep(0.2)
+    i2c.writeto_mem(0x0E, CTRL_REG1, bytes([ctrl_reg1_value]))
+    clock.sleep(0.1)
+
+
+def legacy_script_init(i2c: FakeI2C, clock: VirtualClock, ctrl_reg1_value: int, data_ctrl_reg_value: int):
+    """The init_sensor sequence of driver/driver/main.py and driverAndLog/main.py before the driver."""
+    i2c.writeto_mem(0x0E, CTRL_REG1, bytes([ctrl_reg1_value]))
+    # 0x1D is CTRL_REG2, not DATA_CTRL_REG, and the sensor is already operating
+    i2c.writeto_mem(0x0E, 0x1D, bytes([data_ctrl_reg_value]))
+    clock.sleep(0.1)
+
+
+def check_driver():
+    """
+    Check the KXTJ3 driver against the register model.
+
+    Raises:
+        Exception: If a check fails.
+    """
+    def expect(condition, message):
+        if not condition:
+            raise Exception(message)
+
+    i2c = FakeI2C()
+    clock, device = i2c.clock, i2c.device
+    sensor = KXTJ3(i2c, clock=clock)
+    expect(sensor.who_am_i() == kxtj3.WHO_AM_I_VALUE, "WHO_AM_I mismatch.")
+
+    # Cold start: sync, standby (skipped, already there), ODR, operate
+    expect(sensor.configure(0b11001000, 0x07), "configure() wrote nothing on a cold start.")
+    expect(device.regs[CTRL_REG1] == 0b11001000 and device.regs[DATA_CTRL_REG] == 0x07, "Registers not applied.")
+    expect(sensor.read_raw() == (-32, 32, 512), "First sample after configure() is not valid.")
+    expect(device.invalid_reads == 0, "Read before the turn-on time elapsed.")
+
+    # The turn-on wait covers the sensor's start-up time at every ODR
+    for code in START_UP_US:
+        probe = FakeI2C()
+        KXTJ3(probe, clock=probe.clock).configure(0b11000000, code)
+        probe.readfrom_mem(0x0E, XOUT_L, 6)
+        expect(probe.device.invalid_reads == 0, f"Turn-on wait too short at {kxtj3.ODR_HZ[code]} Hz.")
+
+    # Without the wait the model does report the invalid read
+    probe = FakeI2C()
+    KXTJ3(probe, clock=probe.clock).configure(0b11000000, 0x07, wait=False)
+    probe.readfrom_mem(0x0E, XOUT_L, 6)
+    expect(probe.device.invalid_reads == 1, "Read during start-up was not detected.")
+
+    # Same configuration again: no bus traffic at all
+    i2c.reset_counters()
+    expect(not sensor.configure(0b11001000, 0x07), "Repeated configure() wrote registers.")
+    expect(i2c.transactions == 0, "Repeated configure() used the bus.")
+
+    # Range change: standby, CTRL_REG1 settings, operate; DATA_CTRL_REG write skipped
+    i2c.reset_counters()
+    sensor.configure(0b11010000, 0x07)
+    expect(i2c.transactions == 2, f"Range change took {i2c.transactions} transactions instead of 2.")
+    expect(sensor.read_raw()[2] == 256, "Range change not applied.")
+
+    # ODR change
+    sensor.configure(0b11010000, 0x05)
+    expect(device.regs[DATA_CTRL_REG] == 0x05 and sensor.odr_hz() == 400, "ODR change not applied.")
+
+    # Batch read at the ODR loses no samples
+    device.dropped = 0
+    buf = sensor.read_samples(100)
+    samples = kxtj3.decode_all(buf, 100)
+    expect(device.dropped == 0 and device.repeated_reads == 0, "Paced batch read missed or repeated samples.")
+    expect(len(set(samples)) > 1, "Batch read returned a constant signal.")
+
+    # Software reset restores defaults and clears the shadow copy
+    sensor.reset()
+    expect(device.regs[DATA_CTRL_REG] == 0x02 and CTRL_REG1 not in sensor.shadow, "Software reset not handled.")
+    sensor.configure(0b11000000, 0x07)
+    expect(device.rejected_writes == 0, "Settings were written while operating.")
+
+    # A fresh driver instance on a configured sensor only reads it back
+    i2c.reset_counters()
+    other = KXTJ3(i2c, clock=clock)
+    expect(other.is_configured(0b11000000, 0x07) and not other.configure(0b11000000, 0x07),
+           "Configured sensor was not recognized.")
+    expect(i2c.transactions == 1, "Recognizing the configuration took more than one burst read.")
+
+
+def check_copies():
+    """
+    Check that the driver copies of the standalone scripts match kxtj3.py.
+
+    driver/driver and driverAndLog each carry a copy so that their folder
+    can be uploaded to the board as it is.
+
+    Raises:
+        Exception: If a copy is missing or differs.
+    """
+    here = os.path.dirname(os.path.abspath(__file__))
+    with open(os.path.join(here, 'kxtj3.py'), 'rb') as f:
+        source = f.read()
+    for folder in DRIVER_COPIES:
+        path = os.path.join(here, os.pardir, folder, 'kxtj3.py')
+        try:
+            with open(path, 'rb') as f:
+                copy = f.read()
+        except OSError:
+            copy = None
+        if copy != source:
+            raise Exception(f"{os.path.normpath(path)} is missing or differs from kxtj3.py.")
+
+
+def benchmark(freq: int = 400000) -> list:
+    """
+    Compare bus transactions and time of the old and new init sequences.
+
+    Returns:
+        list: (scenario, transactions, bus time in us, elapsed time in ms,
+        writes ignored by the sensor) tuples.
+    """
+    results = []
+
+    def run(name, action):
+        i2c = FakeI2C(freq)
+        sensor = KXTJ3(i2c, clock=i2c.clock)
+        sensor.configure(0b11000000, 0x07)
+        i2c.reset_counters()
+        i2c.device.rejected_writes = 0
+        t0 = i2c.clock.now_us
+        action(i2c, sensor)
+        results.append((name, i2c.transactions, i2c.bus_us, (i2c.clock.now_us - t0) / 1000,
+                        i2c.device.rejected_writes))
+
+    def cold(i2c, sensor):
+        i2c.device.power_on()
+        sensor.invalidate()
+        sensor.configure(0b11001000, 0x07)
+
+    def cold_legacy(i2c, sensor):
+        i2c.device.power_on()
+        legacy_init(i2c, i2c.clock, 0b11001000, 0x07)
+
+    def cold_script(i2c, sensor):
+        i2c.device.power_on()
+        legacy_script_init(i2c, i2c.clock, 0b11000100, 0x07)
+
+    run('init, old API.init_sensor', cold_legacy)
+    run('init, old driver scripts', cold_script)
+    run('init, KXTJ3.configure', cold)
+    run('re-init, old API.init_sensor', lambda i2c, sensor: legacy_init(i2c, i2c.clock, 0b11000000, 0x07))
+    run('re-init, KXTJ3.configure', lambda i2c, sensor: sensor.configure(0b11000000, 0x07))
+    run('range switch, KXTJ3.configure', lambda i2c, sensor: sensor.configure(0b11010000, 0x07))
+    return results
+
+
+if __name__ == '__main__':
+    check_driver()
+    check_copies()
+    print('driver checks passed')
+    for name, transactions, bus_us, elapsed_ms, rejected in benchmark():
+        print(f'{name:>32}: {transactions:4d} transactions, bus {bus_us:8.1f} us, '
+              f'elapsed {elapsed_ms:8.2f} ms, ignored writes {rejected}')
@@ -0,0 +1,226 @@
+import time
+
+# Register addresses
+XOUT_L = 0x06
+WHO_AM_I = 0x0F
+CTRL_REG1 = 0x1B
+CTRL_REG2 = 0x1D
+DATA_CTRL_REG = 0x21
+
+WHO_AM_I_VALUE = 0x35
+
+# CTRL_REG1 bits
+PC1 = 0x80  # Operating mode (0 = standby)
+RES = 0x40  # 12-bit resolution
+
+# CTRL_REG2 bits
+SRST = 0x80  # Software reset, cleared by the sensor when done
+
+# Output data rate in Hz for each DATA_CTRL_REG value
+ODR_HZ = {
+    0x08: 0.781, 0x09: 1.563, 0x0A: 3.125, 0x0B: 6.25,
+    0x00: 12.5, 0x01: 25, 0x02: 50, 0x03: 100,
+    0x04: 200, 0x05: 400, 0x06: 800, 0x07: 1600
+}
+
+# Time from PC1 = 1 to the first valid sample: the datasheet start-up time is
+# a little over one output data period, plus a fixed part
+TURN_ON_PERIODS = 1.2
+TURN_ON_FIXED_US = 1000
+
+# Software reset completes well within this time
+RESET_TIMEOUT_US = 10000
+
+
+class KXTJ3:
+    """
+    Driver for the Kionix KXTJ3-1057 accelerometer on an I2C bus.
+
+    The control registers are kept in a shadow copy, so writing a value the
+    sensor already holds costs no bus transaction, and re-applying the
+    current configuration is free. Configuration changes follow the
+    required sequence: standby (PC1 = 0), write the settings, operate
+    (PC1 = 1), then wait only for the sensor's turn-on time.
+
+    Runs on MicroPython and, with a simulated bus and clock, on CPython.
+    """
+
+    def __init__(self, i2c, address=0x0E, clock=None):
+        """
+        Parameters:
+            i2c: machine.I2C instance (or anything with the same memory methods).
+            address: I2C address of the sensor.
+            clock: Provides ticks_us, ticks_add, ticks_diff and sleep_us; the time module by default.
+        """
+        self.i2c = i2c
+        self.address = address
+        self.clock = time if clock is None else clock
+        self.shadow = {}  # Register -> value the sensor is known to hold
+        self.writes = 0  # Register writes sent to the sensor
+        self.skipped_writes = 0  # Register writes avoided by the shadow copy
+        self._one = bytearray(1)
+        self._sample = bytearray(6)
+
+    def read_reg(self, reg):
+        """Read one register from the sensor and update its shadow copy."""
+        self.i2c.readfrom_mem_into(self.address, reg, self._one)
+        self.shadow[reg] = self._one[0]
+        return self._one[0]
+
+    def write_reg(self, reg, value):
+        """
+        Write one register unless the sensor already holds the value.
+
+        Returns:
+            True if a bus write was needed.
+        """
+        if self.shadow.get(reg) == value:
+            self.skipped_writes += 1
+            return False
+        self._one[0] = value
+        self.i2c.writeto_mem(self.address, reg, self._one)
+        self.shadow[reg] = value
+        self.writes += 1
+        return True
+
+    def sync(self):
+        """Load CTRL_REG1 through DATA_CTRL_REG into the shadow copy with one burst read."""
+        regs = self.i2c.readfrom_mem(self.address, CTRL_REG1, DATA_CTRL_REG - CTRL_REG1 + 1)
+        for i in range(len(regs)):
+            self.shadow[CTRL_REG1 + i] = regs[i]
+
+    def invalidate(self):
+        """Forget the shadow copy, e.g. after something else wrote to the sensor."""
+        self.shadow = {}
+
+    def who_am_i(self):
+        """Return the WHO_AM_I register (0x35 for the KXTJ3-1057)."""
+        return self.i2c.readfrom_mem(self.address, WHO_AM_I, 1)[0]
+
+    def reset(self):
+        """
+        Software-reset the sensor and wait until it has reloaded its registers.
+
+        Raises:
+            Exception: If the reset does not complete in time.
+        """
+        self.i2c.writeto_mem(self.address, CTRL_REG2, bytes([SRST]))
+        self.invalidate()
+        clock = self.clock
+        start = clock.ticks_us()
+        while True:
+            clock.sleep_us(500)
+            if not self.read_reg(CTRL_REG2) & SRST:
+                return
+            if clock.ticks_diff(clock.ticks_us(), start) > RESET_TIMEOUT_US:
+                raise Exception("KXTJ3 software reset did not complete.")
+
+    def odr_hz(self):
+        """Return the configured output data rate in Hz."""
+        if DATA_CTRL_REG not in self.shadow:
+            self.sync()
+        return ODR_HZ.get(self.shadow[DATA_CTRL_REG] & 0x0F, 50)
+
+    def turn_on_us(self):
+        """Return the wait after entering operating mode until the first valid sample."""
+        return int(TURN_ON_PERIODS * 1000000 / self.odr_hz()) + TURN_ON_FIXED_US
+
+    def is_configured(self, ctrl_reg1_value, data_ctrl_reg_value):
+        """Return True if the sensor is operating with the given register values."""
+        self.sync()
+        return (self.shadow[CTRL_REG1] == ctrl_reg1_value
+                and self.shadow[DATA_CTRL_REG] == data_ctrl_reg_value)
+
+    def standby(self):
+        """Put the sensor into standby, keeping the other CTRL_REG1 settings."""
+        if CTRL_REG1 not in self.shadow:
+            self.sync()
+        self.write_reg(CTRL_REG1, self.shadow[CTRL_REG1] & ~PC1 & 0xFF)
+
+    def configure(self, ctrl_reg1_value, data_ctrl_reg_value, wait=True):
+        """
+        Apply a CTRL_REG1 / DATA_CTRL_REG configuration with the fewest bus transactions.
+
+        Settings can only change in standby, so a change goes through
+        standby -> configure -> operate. Nothing is written if the sensor
+        already runs with these values.
+
+        Parameters:
+            ctrl_reg1_value: CTRL_REG1 value, with PC1 set to start measuring.
+            data_ctrl_reg_value: DATA_CTRL_REG value (output data rate).
+            wait: Wait for the turn-on time, so the next read returns a valid sample.
+
+        Returns:
+            True if any register was written.
+        """
+        if CTRL_REG1 not in self.shadow or DATA_CTRL_REG not in self.shadow:
+            self.sync()
+        current = self.shadow[CTRL_REG1]
+        settings_change = ((current ^ ctrl_reg1_value) & ~PC1 & 0xFF
+                           or self.shadow[DATA_CTRL_REG] != data_ctrl_reg_value)
+        if not settings_change and current == ctrl_reg1_value:
+            return False
+        if settings_change:
+            self.standby()
+            self.write_reg(DATA_CTRL_REG, data_ctrl_reg_value)
+        self.write_reg(CTRL_REG1, ctrl_reg1_value)
+        if wait and ctrl_reg1_value & PC1:
+            self.clock.sleep_us(self.turn_on_us())
+        return True
+
+    def read_into(self, buf):
+        """Read X, Y and Z (6 bytes, low byte first) into buf with one burst transaction."""
+        self.i2c.readfrom_mem_into(self.address, XOUT_L, buf)
+
+    def read_raw(self):
+        """Read one (x, y, z) sample as signed 12-bit counts."""
+        buf = self._sample
+        self.i2c.readfrom_mem_into(self.address, XOUT_L, buf)
+        return decode(buf, 0)
+
+    def read_samples(self, n, buf=None):
+        """
+        Read n consecutive samples, one output data period apart.
+
+        Each sample is one burst transaction into a preallocated buffer, and
+        reads are paced on the clock instead of polling the sensor.
+
+        Parameters:
+            n: Number of samples.
+            buf: bytearray of at least 6 * n bytes to reuse, or None.
+
+        Returns:
+            The buffer holding the raw samples; decode them with decode or decode_all.
+        """
+        if buf is None:
+            buf = bytearray(6 * n)
+        mv = memoryview(buf)
+        clock = self.clock
+        period = int(1000000 / self.odr_hz())
+        due = clock.ticks_us()
+        for i in range(n):
+            wait = clock.ticks_diff(due, clock.ticks_us())
+            if wait > 0:
+                clock.sleep_us(wait)
+            self.i2c.readfrom_mem_into(self.address, XOUT_L, mv[6 * i:6 * i + 6])
+            due = clock.ticks_add(due, period)
+        return buf
+
+
+def decode(buf, offset):
+    """Decode the 6 data bytes at offset into (x, y, z) signed 12-bit counts."""
+    x = ((buf[offset + 1] << 8) | buf[offset]) >> 4
+    y = ((buf[offset + 3] << 8) | buf[offset + 2]) >> 4
+    z = ((buf[offset + 5] << 8) | buf[offset + 4]) >> 4
+    if x & 0x800:
+        x -= 0x1000
+    if y & 0x800:
+        y -= 0x1000
+    if z & 0x800:
+        z -= 0x1000
+    return x, y, z
+
+
+def decode_all(buf, n):
+    """Decode the first n samples of a buffer filled by KXTJ3.read_samples."""
+    return [decode(buf, 6 * i) for i in range(n)]
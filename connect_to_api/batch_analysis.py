@@ -0,0 +1,464 @@
+"""
+batch_analysis.py
+
+This module summarizes archives of SensorApp CSV recordings in parallel.
+Every file is read in streaming chunks and reduced to per-axis statistics
+(mean, RMS, standard deviation, min/max, peak), a Welch power spectrum and
+threshold events on the acceleration magnitude. Files are fanned out across
+a process pool, and results are cached by file identity and analysis
+parameters so reruns skip unchanged files. The tool's own summary and
+slice exports are not analyzed when they sit inside the archive.
+
+Usage:
+    python batch_analysis.py DIR_OR_FILES... [--workers N] [--out summary.csv]
+    python batch_analysis.py --bench DIR [--files N] [--rows N]
+"""
+
+import argparse
+import csv
+import hashlib
+import json
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+
+from recording_index import find_data_offset, iter_chunks, parse_rows, synthesize
+
+# Bump when the analysis changes, so cached results are recomputed
+ANALYSIS_VERSION = 1
+
+DEFAULT_PARAMS = {
+    'nfft': 1024,             # Welch segment length in samples
+    'event_threshold': 0.5,   # Events: | |a| - 1 g | above this many g
+    'max_events': 100         # Events kept per file (all are counted)
+}
+
+AXES = ('x', 'y', 'z', 'magnitude')
+
+# Outputs of this tool and of recording_index.py that are not recordings
+SUMMARY_NAME = 'summary.csv'
+EXPORT_SUFFIX = '.slice.csv'
+
+# Cache entry remembering content hashes by file size and modification time
+HASH_MEMO_KEY = 'content_hashes'
+
+
+class FileAnalysis:
+    """
+    Streaming reduction of one recording, fed chunk by chunk.
+    """
+
+    def __init__(self, params: dict):
+        self.params = params
+        self.count = 0
+        self.mean = np.zeros(4)
+        self.m2 = np.zeros(4)
+        self.sum_sq = np.zeros(4)
+        self.min = np.full(4, np.inf)
+        self.max = np.full(4, -np.inf)
+        self.t_first = None
+        self.t_last = None
+        self.interval_medians = []  # (median interval, number of intervals) per chunk
+        nfft = params['nfft']
+        self.window = np.hanning(nfft)
+        self.psd_sum = np.zeros((3, nfft // 2 + 1))
+        self.segments = 0
+        self.tail = np.zeros((0, 3))
+        self.events = []
+        self.event_count = 0
+        self.in_event = None  # [start time, peak deviation] of an event still open
+
+    def update(self, rows):
+        """
+        Add rows of time, x, y and z.
+        """
+        if not len(rows):
+            return
+        t = rows[:, 0]
+        xyz = rows[:, 1:4]
+        values = np.column_stack((xyz, np.sqrt((xyz ** 2).sum(axis=1))))
+        if self.t_first is None:
+            self.t_first = float(t[0])
+        prev_last = self.t_last
+        self.t_last = float(t[-1])
+        if len(t) > 1:
+            # Medians are not pulled off by pauses such as reconnection gaps
+            self.interval_medians.append((float(np.median(np.diff(t))), len(t) - 1))
+
+        # Chan's parallel update of mean and variance per channel
+        n_b = len(values)
+        mean_b = values.mean(axis=0)
+        m2_b = ((values - mean_b) ** 2).sum(axis=0)
+        total = self.count + n_b
+        delta = mean_b - self.mean
+        self.mean += delta * n_b / total
+        self.m2 += m2_b + delta ** 2 * self.count * n_b / total
+        self.count = total
+        self.sum_sq += (values ** 2).sum(axis=0)
+        self.min = np.minimum(self.min, values.min(axis=0))
+        self.max = np.maximum(self.max, values.max(axis=0))
+
+        self._update_spectrum(xyz)
+        self._update_events(t, values[:, 3], prev_last)
+
+    def _update_spectrum(self, xyz):
+        """
+        Accumulate Welch periodograms over 50% overlapping segments, carrying the remainder.
+        """
+        nfft = self.params['nfft']
+        hop = nfft // 2
+        data = np.concatenate((self.tail, xyz))
+        starts = np.arange(0, len(data) - nfft + 1, hop)
+        if len(starts):
+            idx = starts[:, None] + np.arange(nfft)
+            segs = data[idx]                       # (segments, nfft, 3)
+            segs = segs - segs.mean(axis=1, keepdims=True)
+            spec = np.abs(np.fft.rfft(segs * self.window[None, :, None], axis=1)) ** 2
+            self.psd_sum += spec.sum(axis=0).T
+            self.segments += len(starts)
+            self.tail = data[starts[-1] + hop:]
+        else:
+            self.tail = data
+
+    def _update_events(self, t, magnitude, prev_last):
+        """
+        Find runs where the magnitude deviates from 1 g by more than the threshold.
+
+        An event still open at the end of the previous chunk is continued;
+        prev_last is that chunk's last timestamp.
+        """
+        dev = np.abs(magnitude - 1.0)
+        above = dev > self.params['event_threshold']
+        if not above.any() and self.in_event is None:
+            return
+        edges = np.diff(above.astype(np.int8), prepend=np.int8(self.in_event is not None))
+        starts = np.flatnonzero(edges == 1)
+        ends = np.flatnonzero(edges == -1)
+        if self.in_event is not None:
+            starts = np.concatenate(([-1], starts))
+        for i, s in enumerate(starts):
+            e = ends[i] if i < len(ends) else None
+            seg = dev[max(s, 0):e]
+            peak = float(seg.max()) if len(seg) else 0.0
+            if s < 0:
+                start_t, peak = self.in_event[0], max(self.in_event[1], peak)
+            else:
+                start_t = float(t[s])
+            if e is None:
+                self.in_event = [start_t, peak]
+            else:
+                self.in_event = None
+                self._close_event(start_t, float(t[e - 1]) if e > 0 else prev_last, peak)
+
+    def _close_event(self, start, end, peak):
+        self.event_count += 1
+        if len(self.events) < self.params['max_events']:
+            self.events.append({'start': start, 'end': end, 'peak_deviation_g': peak})
+
+    def result(self) -> dict:
+        """
+        Return the reduced statistics as a JSON-serializable dictionary.
+        """
+        if self.in_event is not None:
+            self._close_event(self.in_event[0], self.t_last, self.in_event[1])
+            self.in_event = None
+        duration = (self.t_last - self.t_first) if self.count > 1 else 0.0
+        rate = None
+        if self.interval_medians:
+            # Median of the chunk medians, weighted by their interval counts
+            medians, counts = np.array(self.interval_medians).T
+            order = np.argsort(medians)
+            cum = np.cumsum(counts[order])
+            interval = medians[order][np.searchsorted(cum, cum[-1] / 2)]
+            rate = 1.0 / interval if interval > 0 else None
+        result = {
+            'rows': self.count,
+            'duration_s': duration,
+            'sample_rate_hz': rate,
+            'events': self.event_count,
+            'event_list': self.events
+        }
+        if self.count:
+            for i, axis in enumerate(AXES):
+                result[axis] = {
+                    'mean': float(self.mean[i]),
+                    'rms': float(np.sqrt(self.sum_sq[i] / self.count)),
+                    'std': float(np.sqrt(self.m2[i] / self.count)),
+                    'min': float(self.min[i]),
+                    'max': float(self.max[i]),
+                    'peak': float(max(abs(self.min[i]), abs(self.max[i])))
+                }
+        if self.segments and rate:
+            nfft = self.params['nfft']
+            # One-sided PSD in g^2/Hz
+            psd = self.psd_sum / self.segments / (rate * (self.window ** 2).sum())
+            psd[:, 1:-1] *= 2
+            freqs = np.fft.rfftfreq(nfft, 1.0 / rate)
+            result['spectrum'] = {'freqs_hz': freqs.tolist()}
+            for i, axis in enumerate(AXES[:3]):
+                result['spectrum'][axis] = psd[i].tolist()
+                result[axis]['dominant_hz'] = float(freqs[1 + int(np.argmax(psd[i, 1:]))])
+        return result
+
+
+def analyze_file(path: str, params: dict) -> dict:
+    """
+    Analyze one recording in streaming chunks.
+
+    Parameters:
+        path (str): Path of the CSV recording.
+        params (dict): Analysis parameters (see DEFAULT_PARAMS).
+
+    Returns:
+        dict: The file's statistics.
+    """
+    analysis = FileAnalysis(params)
+    with open(path, 'rb') as f:
+        start = find_data_offset(f)
+        end = os.fstat(f.fileno()).st_size
+        for offset, data in iter_chunks(f, start, end):
+            analysis.update(parse_rows(data, offset)[1])
+    return analysis.result()
+
+
+def file_hash(path: str) -> str:
+    """
+    Return the SHA-1 of a file's content.
+    """
+    h = hashlib.sha1()
+    with open(path, 'rb') as f:
+        for block in iter(lambda: f.read(1 << 20), b''):
+            h.update(block)
+    return h.hexdigest()
+
+
+def cache_key(path: str, params: dict, sha1: str = None) -> str:
+    """
+    Return the cache key of a file and analysis parameters.
+
+    The key covers the absolute path, size and modification time, or the
+    size and the content hash sha1 for archives whose mtimes are unreliable.
+    """
+    st = os.stat(path)
+    identity = {
+        'path': os.path.abspath(path),
+        'size': st.st_size,
+        'mtime_ns': st.st_mtime_ns,
+        'params': params,
+        'version': ANALYSIS_VERSION
+    }
+    if sha1 is not None:
+        identity['sha1'] = sha1
+        del identity['mtime_ns']
+    return hashlib.sha1(json.dumps(identity, sort_keys=True).encode()).hexdigest()
+
+
+def content_hashes(files, memo: dict, workers: int = None) -> dict:
+    """
+    Return the content hash of every file, hashing only files whose size or mtime changed.
+
+    Parameters:
+        files (list): Paths of the files.
+        memo (dict): Absolute path -> [size, mtime_ns, sha1] of earlier runs; updated in place.
+        workers (int): Number of worker processes hashing changed files.
+
+    Returns:
+        dict: path -> SHA-1.
+    """
+    hashes = {}
+    stale = []
+    for path in files:
+        st = os.stat(path)
+        known = memo.get(os.path.abspath(path))
+        if known and known[0] == st.st_size and known[1] == st.st_mtime_ns:
+            hashes[path] = known[2]
+        else:
+            stale.append((path, st))
+    computed = _map(file_hash, [path for path, _ in stale], workers)
+    for (path, st), sha1 in zip(stale, computed):
+        memo[os.path.abspath(path)] = [st.st_size, st.st_mtime_ns, sha1]
+        hashes[path] = sha1
+    return hashes
+
+
+def load_cache(cache_path: str) -> dict:
+    if not cache_path or not os.path.exists(cache_path):
+        return {}
+    try:
+        with open(cache_path) as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {}
+
+
+def save_cache(cache_path: str, cache: dict):
+    tmp = cache_path + '.tmp'
+    with open(tmp, 'w') as f:
+        json.dump(cache, f)
+    os.replace(tmp, cache_path)
+
+
+def find_recordings(paths, exclude=()) -> list:
+    """
+    Expand directories into the CSV recordings they contain, recursively.
+
+    Summaries and slice exports found in directories are skipped, as are
+    the paths in exclude (e.g. the summary file of this run).
+    """
+    skip = {os.path.abspath(p) for p in exclude}
+    files = []
+    for path in paths:
+        if os.path.isdir(path):
+            for root, _, names in os.walk(path):
+                for n in names:
+                    name = n.lower()
+                    if name.endswith('.csv') and name != SUMMARY_NAME and not name.endswith(EXPORT_SUFFIX):
+                        files.append(os.path.join(root, n))
+        else:
+            files.append(path)
+    return sorted(f for f in files if os.path.abspath(f) not in skip)
+
+
+def analyze_archive(paths, params: dict = None, workers: int = None, cache_path: str = None,
+                    content_hash: bool = False, exclude=()) -> dict:
+    """
+    Analyze many recordings across a process pool, reusing cached results.
+
+    Parameters:
+        paths (list): Files or directories to analyze.
+        params (dict): Analysis parameters, merged over DEFAULT_PARAMS.
+        workers (int): Number of worker processes (default: CPU count).
+        cache_path (str): JSON cache file, or None to disable caching.
+        content_hash (bool): Key the cache on a content hash instead of the
+            mtime. Hashes are remembered in the cache and only recomputed,
+            across the worker pool, for files whose size or mtime changed.
+        exclude (list): Paths that are not recordings, see find_recordings.
+
+    Returns:
+        dict: path -> statistics (or {'error': message}).
+    """
+    params = dict(DEFAULT_PARAMS, **(params or {}))
+    files = find_recordings(paths, exclude)
+    cache = load_cache(cache_path)
+    hashes = content_hashes(files, cache.setdefault(HASH_MEMO_KEY, {}), workers) if content_hash else {}
+    keys = {path: cache_key(path, params, hashes.get(path)) for path in files}
+    results = {path: cache[keys[path]] for path in files if keys[path] in cache}
+    todo = [path for path in files if path not in results]
+    # Largest files first keeps the pool busy until the end
+    todo.sort(key=os.path.getsize, reverse=True)
+
+    if todo:
+        computed = _map(_analyze_safe, todo, workers, params)
+        for path, result in zip(todo, computed):
+            results[path] = result
+            if 'error' not in result:
+                cache[keys[path]] = result
+    if cache_path and (todo or content_hash):
+        save_cache(cache_path, cache)
+    return {path: results[path] for path in files}
+
+
+def _map(func, items: list, workers: int = None, *args) -> list:
+    """
+    Apply func(item, *args) to every item across a process pool (in this process for one worker).
+    """
+    if not items:
+        return []
+    if workers == 1:
+        return [func(item, *args) for item in items]
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        return list(pool.map(func, items, *[[arg] * len(items) for arg in args]))
+
+
+def _analyze_safe(path: str, params: dict) -> dict:
+    try:
+        return analyze_file(path, params)
+    except Exception as e:
+        return {'error': str(e)}
+
+
+def write_summary(results: dict, out_path: str):
+    """
+    Write one CSV row of headline statistics per file.
+    """
+    header = ['File', 'Rows', 'Duration (s)', 'Rate (Hz)', 'Events']
+    for axis in AXES:
+        header += [f'{axis} mean', f'{axis} rms', f'{axis} std', f'{axis} peak']
+    header += [f'{axis} dominant (Hz)' for axis in AXES[:3]]
+    with open(out_path, 'w', newline='') as csvfile:
+        csvwriter = csv.writer(csvfile)
+        csvwriter.writerow(header)
+        for path, r in results.items():
+            if 'error' in r or not r['rows']:
+                csvwriter.writerow([path, r.get('error', 'empty')])
+                continue
+            row = [path, r['rows'], r['duration_s'], r['sample_rate_hz'], r['events']]
+            for axis in AXES:
+                row += [r[axis]['mean'], r[axis]['rms'], r[axis]['std'], r[axis]['peak']]
+            row += [r[axis].get('dominant_hz') for axis in AXES[:3]]
+            csvwriter.writerow(row)
+
+
+def benchmark(directory: str, files: int = 32, rows: int = 500000) -> list:
+    """
+    Measure speed-up versus worker count on a synthetic archive (without cache).
+
+    Returns:
+        list: (workers, seconds, speed-up) tuples.
+    """
+    os.makedirs(directory, exist_ok=True)
+    for i in range(files):
+        path = os.path.join(directory, f'capture_{i:03d}.csv')
+        if not os.path.exists(path):
+            synthesize(path, rows)
+    counts = []
+    n = 1
+    while n < (os.cpu_count() or 1):
+        counts.append(n)
+        n *= 2
+    counts.append(os.cpu_count() or 1)
+    timings = []
+    for workers in counts:
+        t0 = time.perf_counter()
+        analyze_archive([directory], workers=workers)
+        timings.append((workers, time.perf_counter() - t0))
+    base = timings[0][1]
+    return [(w, t, base / t) for w, t in timings]
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Parallel batch analysis of SensorApp recordings.')
+    parser.add_argument('paths', nargs='*', help='CSV files or directories')
+    parser.add_argument('--workers', type=int, default=None, help='worker processes (default: CPU count)')
+    parser.add_argument('--cache', default='.analysis_cache.json', help='result cache file ("" to disable)')
+    parser.add_argument('--hash', action='store_true', help='key the cache on file content instead of mtime')
+    parser.add_argument('--nfft', type=int, default=DEFAULT_PARAMS['nfft'])
+    parser.add_argument('--threshold', type=float, default=DEFAULT_PARAMS['event_threshold'])
+    parser.add_argument('--out', default='summary.csv', help='summary CSV file')
+    parser.add_argument('--json', help='also write full results (spectra, events) as JSON')
+    parser.add_argument('--bench', metavar='DIR', help='benchmark speed-up on a synthetic archive in DIR')
+    parser.add_argument('--files', type=int, default=32, help='files in the synthetic archive')
+    parser.add_argument('--rows', type=int, default=500000, help='rows per synthetic file')
+    args = parser.parse_args()
+
+    if args.bench:
+        for workers, seconds, speedup in benchmark(args.bench, args.files, args.rows):
+            print(f'{workers:3d} workers: {seconds:7.2f} s, speed-up {speedup:5.2f}x')
+        return
+    if not args.paths:
+        parser.error('no recordings given')
+
+    params = {'nfft': args.nfft, 'event_threshold': args.threshold}
+    t0 = time.perf_counter()
+    results = analyze_archive(args.paths, params, args.workers, args.cache or None, args.hash, [args.out])
+    write_summary(results, args.out)
+    if args.json:
+        with open(args.json, 'w') as f:
+            json.dump(results, f)
+    print(f'{len(results)} files analyzed in {time.perf_counter() - t0:.2f} s, summary written to {args.out}')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,385 @@
+"""
+fake_device.py
+
+This module provides FakeDevice, a simulated board running MPY_REPL_API/API.py
+behind its MicroPython REPL. It implements the parts of the serial.Serial
+interface used by SerialComm, so the host stack can be exercised and timed
+without hardware. FakeLink adds dropouts on a schedule for testing
+reconnection. Running the module measures range/ODR switch latency.
+"""
+
+import math
+import random
+import re
+import time
+
+import serial
+
+from serial_comm import SerialComm, FULL_SCALE, ODR_HZ, encode_frame
+
+
+class FakeDevice:
+    """
+    Simulated KXTJ3 board answering the API handshake and streaming samples.
+
+    Samples are produced lazily from the wall clock whenever the host polls,
+    so no background thread is needed. Delays mirror API.py: init_sensor
+    blocks for init_delay seconds and read_accel sleeps start_delay seconds
+    before the first sample.
+    """
+
+    def __init__(self, port: str = 'fake', baudrate: int = 115200, timeout: float = 1,
+                 init_delay: float = None, start_delay: float = 2.0, frame_len: int = 32, seed: int = 0,
+                 link=None):
+        """
+        Initialize the FakeDevice instance.
+
+        Parameters:
+            port (str): Ignored, accepted for serial.Serial compatibility.
+            baudrate (int): Ignored, accepted for serial.Serial compatibility.
+            timeout (float): Read timeout in seconds, as in serial.Serial.
+            init_delay (float): Time API.init_sensor keeps the device busy, or
+                None for the turn-on time KXTJ3.configure waits at the new ODR.
+            start_delay (float): Sleep at the start of API.read_accel.
+            frame_len (int): Samples per binary frame.
+            seed (int): Seed for the simulated sensor noise.
+            link (FakeLink): Dropout schedule the device follows, or None.
+        """
+        self.port = port
+        self.timeout = timeout
+        self.init_delay = init_delay
+        self.start_delay = start_delay
+        self.frame_len = frame_len
+        self.is_open = True
+        self._rng = random.Random(seed)
+        self._out = bytearray()
+        self._line = b''
+        self._busy_until = 0.0
+        self.scale_range = 2
+        self.odr = 2048
+        self.codec = None  # Streaming codec, None while at the REPL prompt
+        self._stream_t0 = 0.0
+        self._emitted = 0
+        self._seq = 0
+        self._frame = []
+        self._pending_ack = None
+        self._phase = 0
+        self.sensor = None  # (range, odr) keys the sensor registers hold, None until init_sensor
+        self.link = link
+        self._outage = link.outage_index(time.time()) if link else 0
+        self._dead = False
+        self._boot_until = None
+
+    # serial.Serial interface
+
+    @property
+    def in_waiting(self) -> int:
+        self._pump()
+        return len(self._out)
+
+    def read(self, size: int = 1) -> bytes:
+        self._pump()
+        data = bytes(self._out[:size])
+        del self._out[:size]
+        return data
+
+    def readline(self) -> bytes:
+        deadline = time.time() + self.timeout
+        while True:
+            self._pump()
+            end = self._out.find(b'\n')
+            if end >= 0:
+                line = bytes(self._out[:end + 1])
+                del self._out[:end + 1]
+                return line
+            if time.time() >= deadline:
+                line = bytes(self._out)
+                self._out.clear()
+                return line
+            time.sleep(0.001)
+
+    def write(self, data: bytes) -> int:
+        self._check_link()
+        if self._boot_until is not None:
+            return len(data)  # Input is lost while the board boots
+        for c in data:
+            if c == 0x03:
+                # Ctrl+C interrupts read_accel and returns to the prompt
+                self._pump()
+                self._stop_stream()
+                self._out += b'KeyboardInterrupt: \r\n>>> '
+            elif c == 0x04:
+                # Ctrl+D soft-resets the board
+                self._stop_stream()
+                self._out += b'MPY: soft reboot\r\n'
+            elif c in (0x0A, 0x0D):
+                if self._line:
+                    self._command(self._line.decode())
+                    self._line = b''
+            else:
+                self._line += bytes([c])
+        return len(data)
+
+    def reset_input_buffer(self):
+        self._pump()
+        self._out.clear()
+
+    def start_main(self, now: float = None):
+        """Start streaming text at the default settings, as main.py does after boot."""
+        self.codec = 'text'
+        self._start_stream(time.time() if now is None else now)
+
+    def close(self):
+        self.is_open = False
+
+    # Simulation
+
+    def _command(self, line: str):
+        """Handle one line typed at the REPL or sent in-band while streaming."""
+        now = time.time()
+        if self.codec is not None:
+            self._pump(now)
+            self._in_band(line, now)
+            return
+        echo = f'>>> {line}\r\n'.encode()
+        if line == 'import API' or line == 'API.check_who_am_i()':
+            self._out += echo + (b'True\r\n' if 'who_am_i' in line else b'')
+        elif line.startswith('API.init_sensor('):
+            sensor = tuple(int(k) for k in re.findall(r'\[(\d+)\]', line))
+            self._busy_until = max(now, self._busy_until) + self._init_time(sensor)
+            self.sensor = sensor
+            self.odr = sensor[1]
+            self._out += echo
+        elif line.startswith('API.is_configured('):
+            keys = tuple(int(k) for k in re.findall(r'\[(\d+)\]', line))
+            self._out += echo + (b'True\r\n' if keys == self.sensor else b'False\r\n')
+        elif line == 'API.codecs()':
+            self._out += echo + b"'delta pack text'\r\n"
+        elif line.startswith('API.read_accel('):
+            args = line[len('API.read_accel('):-1].split(',')
+            self.scale_range = int(args[0])
+            self.codec = args[1].strip("'") if len(args) > 1 else 'text'
+            start_delay = float(args[2]) if len(args) > 2 else self.start_delay
+            self._out += echo
+            self._start_stream(max(now, self._busy_until) + start_delay)
+        else:
+            self._out += echo + b"NameError: name isn't defined\r\n"
+
+    def _in_band(self, line: str, now: float):
+        """Apply a 'cfg <range> <odr>' command received while streaming."""
+        parts = line.split()
+        if len(parts) != 3 or parts[0] != 'cfg':
+            return
+        self._flush_frame()
+        sensor = (int(parts[1]), int(parts[2]))
+        delay = self._init_time(sensor)
+        self.scale_range, self.odr = self.sensor = sensor
+        self._pending_ack = f'cfg {self.scale_range} {self.odr}'
+        self._start_stream(now + delay)
+
+    def _init_time(self, sensor: tuple) -> float:
+        """Return how long API.init_sensor blocks when switching the sensor to (range, odr)."""
+        if self.init_delay is not None:
+            return self.init_delay
+        if sensor == self.sensor:
+            return 0.0  # Nothing to write
+        # KXTJ3.configure waits 1.2 output data periods plus 1 ms for the first sample
+        return 1.2 / ODR_HZ[sensor[1]] + 0.001
+
+    def _start_stream(self, t0: float):
+        self._stream_t0 = t0
+        self._emitted = 0
+
+    def _stop_stream(self):
+        self.codec = None
+        self._frame = []
+        self._pending_ack = None
+
+    def _check_link(self, now: float = None):
+        """Apply a scheduled dropout of the link, see FakeLink."""
+        if self.link is None:
+            return
+        now = time.time() if now is None else now
+        if self._dead:
+            raise serial.SerialException('device disconnected')
+        outage = self.link.outage_index(now)
+        if outage > self._outage:
+            self._outage = outage
+            self._pump(self.link.outage_start(outage))
+            if self.link.mode == 'hang':
+                # The program stops sending until it is interrupted with Ctrl+C
+                self._start_stream(math.inf)
+                return
+            self._stop_stream()
+            if self.link.mode == 'unplug':
+                self._dead = True
+                raise serial.SerialException('device disconnected')
+            # The board resets while the port stays open; the sensor keeps its registers
+            self._out.clear()
+            self._boot_until = self.link.outage_start(outage) + self.link.down_time
+        if self._boot_until is not None and now >= self._boot_until:
+            self._out += b'MPY: soft reboot\r\n'
+            if self.link.autostart:
+                self.start_main(self._boot_until)
+            self._boot_until = None
+
+    def _pump(self, now: float = None):
+        """Emit everything the device would have sent up to now."""
+        self._check_link(now)
+        if self.codec is None:
+            return
+        now = time.time() if now is None else now
+        if now < self._stream_t0:
+            return
+        if self._pending_ack is not None:
+            if self.codec == 'text':
+                self._out += f'#{self._pending_ack}\r\n'.encode()
+            else:
+                self._out += _control_frame(self._pending_ack)
+            self._pending_ack = None
+        due = int((now - self._stream_t0) * ODR_HZ[self.odr]) - self._emitted
+        for _ in range(due):
+            self._emit(self._sample())
+        self._emitted += due
+
+    def _sample(self) -> tuple:
+        """Return the next simulated (x, y, z) sample in counts."""
+        self._phase += 1
+        w = math.sin(self._phase * 0.05) * 0.05 * 2048 / FULL_SCALE[self.scale_range]
+        lsb = 2048 / FULL_SCALE[self.scale_range]
+        return (int(w + self._rng.gauss(0, 2)),
+                int(-w + self._rng.gauss(0, 2)),
+                max(-2048, min(2047, int(lsb + self._rng.gauss(0, 2)))))
+
+    def _emit(self, sample: tuple):
+        if self.codec == 'text':
+            s = FULL_SCALE[self.scale_range] / 2048
+            self._out += f'{sample[0] * s} {sample[1] * s} {sample[2] * s}\r\n'.encode()
+            return
+        self._frame.append(sample)
+        if len(self._frame) >= self.frame_len:
+            self._flush_frame()
+
+    def _flush_frame(self):
+        if self._frame and self.codec not in (None, 'text'):
+            self._out += encode_frame(self.codec, self._frame, self._seq)
+            self._seq = (self._seq + len(self._frame)) & 0xFFFF
+        self._frame = []
+
+
+class FakeLink:
+    """
+    Serial factory for FakeDevice boards whose link drops out on a schedule.
+
+    Outage k starts k * period seconds after the link is created and lasts
+    down_time seconds. In 'unplug' mode the USB port disappears: I/O on the
+    open port raises serial.SerialException, the port cannot be opened until
+    the outage ends and the board comes back powered up from scratch. In
+    'reset' mode the board resets while the port stays open, so the stream
+    just stops; the sensor keeps its registers. Either way the rebooted board
+    runs main.py and streams text if autostart is set. In 'hang' mode the
+    program on the board stops sending without a reset and resumes after a
+    Ctrl+C; down_time does not apply.
+    """
+
+    def __init__(self, period: float = 1.0, down_time: float = 0.05, mode: str = 'unplug',
+                 autostart: bool = True, **device_args):
+        """
+        Initialize the FakeLink instance.
+
+        Parameters:
+            period (float): Seconds between the starts of two outages.
+            down_time (float): Length of each outage in seconds.
+            mode (str): 'unplug', 'reset' or 'hang'.
+            autostart (bool): Rebooted boards start streaming text on their own.
+            device_args: Further FakeDevice arguments (init_delay, start_delay, ...).
+        """
+        if mode not in ('unplug', 'reset', 'hang'):
+            raise ValueError(f"Unknown dropout mode: {mode}")
+        self.period = period
+        self.down_time = down_time
+        self.mode = mode
+        self.autostart = autostart
+        self.device_args = device_args
+        self.t0 = time.time()
+        self.opened = 0
+        self.device = None  # Board currently attached to the port
+
+    def outage_index(self, now: float) -> int:
+        """Return the number of outages that have started by now."""
+        return int((now - self.t0) // self.period)
+
+    def outage_start(self, k: int) -> float:
+        """Return the start time of outage k."""
+        return self.t0 + k * self.period
+
+    def __call__(self, port: str, baudrate: int = 115200, timeout: float = 1) -> FakeDevice:
+        now = time.time()
+        k = self.outage_index(now)
+        if k and now < self.outage_start(k) + self.down_time:
+            raise serial.SerialException(f'could not open port {port}')
+        self.opened += 1
+        device = self.device
+        if device is not None and not device._dead:
+            # Same board as before, opened again
+            device.is_open = True
+            device.timeout = timeout
+            return device
+        device = self.device = FakeDevice(port, baudrate, timeout=timeout, link=self, **self.device_args)
+        if k and self.autostart:
+            # The board was powered up again and runs main.py
+            device.start_main(self.outage_start(k) + self.down_time)
+        return device
+
+
+def _control_frame(message: str) -> bytes:
+    """Encode a control message the way API.encode_control does."""
+    payload = message.encode()
+    return b'\xa5\x5a' + bytes([0, 0, 0, 0, len(payload) & 0xFF, len(payload) >> 8]) + payload
+
+
+def measure_switch_latency(codec: str = 'delta', init_delay: float = None, start_delay: float = 2.0) -> dict:
+    """
+    Measure how long the stream is interrupted by a range/ODR switch.
+
+    Compares the in-band 'cfg' command against the previous approach of
+    disconnecting and connecting again with the new settings.
+
+    Returns:
+        dict: Seconds from the switch request to the first sample at the new
+        configuration, for 'live' and 'reconnect'.
+    """
+    def factory(port, baudrate, timeout):
+        return FakeDevice(port, baudrate, timeout=timeout, init_delay=init_delay, start_delay=start_delay)
+
+    def wait_for_samples(comm, version):
+        while True:
+            blocks = comm.read_blocks()
+            if comm.config_version >= version and blocks:
+                return
+            time.sleep(0.001)
+
+    results = {}
+    comm = SerialComm('kionix', 2, 2048, 'fake', timeout=0.05, codec=codec, serial_factory=factory)
+    comm.connect()
+    wait_for_samples(comm, 0)
+    t0 = time.perf_counter()
+    comm.reconfigure(4, 512)
+    wait_for_samples(comm, 1)
+    results['live'] = time.perf_counter() - t0
+
+    t0 = time.perf_counter()
+    comm.disconnect()
+    comm = SerialComm('kionix', 8, 1024, 'fake', timeout=0.05, codec=codec, serial_factory=factory)
+    comm.connect()
+    wait_for_samples(comm, 0)
+    results['reconnect'] = time.perf_counter() - t0
+    comm.disconnect()
+    return results
+
+
+if __name__ == '__main__':
+    for codec in ('text', 'delta'):
+        latency = measure_switch_latency(codec)
+        print(f"{codec:>5}: live switch {latency['live'] * 1000:7.1f} ms, "
+              f"disconnect/connect {latency['reconnect'] * 1000:7.1f} ms")
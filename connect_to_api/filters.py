@@ -0,0 +1,367 @@
+"""
+filters.py
+
+This module provides stateful streaming filters for the acquisition path:
+biquad cascades (Butterworth low-, high- and band-pass), a decimating FIR
+filter and a CIC decimator. Every filter processes blocks of shape
+(samples, channels) with NumPy or SciPy and keeps its state between blocks, so
+feeding a signal block by block gives exactly the same output as feeding
+it in one pass. Running the module benchmarks throughput at 1600 Hz.
+"""
+
+import math
+import time
+
+import numpy as np
+from scipy.signal import sosfilt
+
+
+def design_biquad(kind: str, f0: float, fs: float, q: float = 1 / math.sqrt(2)) -> list:
+    """
+    Design one biquad section with the RBJ audio-EQ cookbook formulas.
+
+    Parameters:
+        kind (str): 'lowpass', 'highpass' or 'bandpass' (0 dB peak gain).
+        f0 (float): Cutoff or centre frequency in Hz.
+        fs (float): Sample rate in Hz.
+        q (float): Quality factor.
+
+    Returns:
+        list: Normalized coefficients [b0, b1, b2, a1, a2].
+    """
+    if not 0 < f0 < fs / 2:
+        raise ValueError(f"Filter frequency {f0} Hz must lie between 0 and {fs / 2} Hz.")
+    w0 = 2 * math.pi * f0 / fs
+    cos_w0 = math.cos(w0)
+    alpha = math.sin(w0) / (2 * q)
+    if kind == 'lowpass':
+        b = [(1 - cos_w0) / 2, 1 - cos_w0, (1 - cos_w0) / 2]
+    elif kind == 'highpass':
+        b = [(1 + cos_w0) / 2, -(1 + cos_w0), (1 + cos_w0) / 2]
+    elif kind == 'bandpass':
+        b = [alpha, 0.0, -alpha]
+    else:
+        raise ValueError(f"Unknown filter type: {kind}")
+    a0 = 1 + alpha
+    return [b[0] / a0, b[1] / a0, b[2] / a0, -2 * cos_w0 / a0, (1 - alpha) / a0]
+
+
+def butterworth(kind: str, order: int, fs: float, f1: float, f2: float = None) -> list:
+    """
+    Design a Butterworth filter as a list of biquad sections.
+
+    Parameters:
+        kind (str): 'lowpass', 'highpass' or 'bandpass'.
+        order (int): Even filter order (per edge for band-pass).
+        fs (float): Sample rate in Hz.
+        f1 (float): Cutoff frequency, or lower edge for band-pass.
+        f2 (float): Upper edge for band-pass.
+
+    Returns:
+        list: Biquad sections as [b0, b1, b2, a1, a2].
+    """
+    if order < 2 or order % 2:
+        raise ValueError("Butterworth order must be an even number of at least 2.")
+    m = order // 2
+    qs = [1 / (2 * math.cos((2 * k + 1) * math.pi / (4 * m))) for k in range(m)]
+    if kind == 'bandpass':
+        if f2 is None or f2 <= f1:
+            raise ValueError("Band-pass needs an upper edge above the lower edge.")
+        return [design_biquad('highpass', f1, fs, q) for q in qs] + [design_biquad('lowpass', f2, fs, q) for q in qs]
+    return [design_biquad(kind, f1, fs, q) for q in qs]
+
+
+def lowpass_fir(numtaps: int, cutoff: float, fs: float) -> np.ndarray:
+    """
+    Design a linear-phase low-pass FIR filter (Hamming-windowed sinc) with unit DC gain.
+    """
+    n = np.arange(numtaps) - (numtaps - 1) / 2
+    taps = np.sinc(2 * cutoff / fs * n) * np.hamming(numtaps)
+    return taps / taps.sum()
+
+
+class BiquadCascade:
+    """
+    Cascade of biquad sections in transposed direct form II, one state per channel.
+
+    Whole blocks are filtered by scipy.signal.sosfilt, which carries the
+    state between blocks.
+    """
+
+    def __init__(self, sections: list, channels: int):
+        """
+        Initialize the BiquadCascade instance.
+
+        Parameters:
+            sections (list): Biquad sections as [b0, b1, b2, a1, a2].
+            channels (int): Number of channels filtered in parallel.
+        """
+        self.sections = [list(map(float, s)) for s in sections]
+        self.channels = channels
+        # Second-order sections in SciPy's layout: b0, b1, b2, a0 = 1, a1, a2
+        self.sos = np.array([[b0, b1, b2, 1.0, a1, a2] for b0, b1, b2, a1, a2 in self.sections])
+        self.reset()
+
+    def reset(self):
+        """
+        Clear the filter state.
+        """
+        self.state = np.zeros((len(self.sections), 2, self.channels))
+
+    def process(self, block) -> np.ndarray:
+        """
+        Filter a block of shape (samples, channels) and return the filtered block.
+        """
+        x = np.asarray(block, dtype=np.float64).reshape(-1, self.channels)
+        if not len(x):
+            return x.copy()
+        y, self.state = sosfilt(self.sos, x, axis=0, zi=self.state)
+        return y
+
+    def group_delay(self) -> float:
+        """
+        Return the group delay at DC in samples.
+
+        Each section adds sum(n * b_n) / sum(b_n) - sum(n * a_n) / sum(a_n);
+        a cascade without DC gain (high- or band-pass) has none and returns 0.
+        """
+        delay = 0.0
+        for b0, b1, b2, a1, a2 in self.sections:
+            b_sum = b0 + b1 + b2
+            if abs(b_sum) < 1e-12:
+                return 0.0
+            delay += (b1 + 2 * b2) / b_sum - (a1 + 2 * a2) / (1 + a1 + a2)
+        return delay
+
+
+class FirDecimator:
+    """
+    FIR filter that keeps every factor-th output sample.
+    """
+
+    def __init__(self, taps, factor: int, channels: int):
+        """
+        Initialize the FirDecimator instance.
+
+        Parameters:
+            taps (array-like): FIR coefficients.
+            factor (int): Decimation factor.
+            channels (int): Number of channels filtered in parallel.
+        """
+        self.taps = np.asarray(taps, dtype=np.float64)
+        self.factor = factor
+        self.channels = channels
+        self.reset()
+
+    def reset(self):
+        """
+        Clear the filter history.
+        """
+        self.history = np.zeros((len(self.taps) - 1, self.channels))
+        self.position = 0  # Index of the next input sample in the whole stream
+
+    def process(self, block) -> np.ndarray:
+        """
+        Filter and decimate a block of shape (samples, channels).
+
+        Returns:
+            ndarray: Outputs for the input samples whose stream index is a
+            multiple of the factor.
+        """
+        block = np.asarray(block, dtype=np.float64).reshape(-1, self.channels)
+        n = len(block)
+        keep = len(self.taps) - 1
+        buf = np.concatenate((self.history, block))
+        first = (-self.position) % self.factor
+        idx = np.arange(first, n, self.factor) + keep
+        # Sum taps in a fixed order so block size cannot change the rounding
+        out = np.zeros((len(idx), self.channels))
+        for m, h in enumerate(self.taps):
+            out += h * buf[idx - m]
+        self.history = buf[len(buf) - keep:] if keep else buf[:0]
+        self.position += n
+        return out
+
+
+class CicDecimator:
+    """
+    Cascaded integrator-comb decimator with unit DC gain.
+
+    Inputs are quantized to integers (scale steps per unit) and the
+    integrators wrap around in int64, as in hardware CIC filters, so the
+    state never loses precision on long streams.
+    """
+
+    def __init__(self, order: int, factor: int, channels: int, scale: float = 4096):
+        """
+        Initialize the CicDecimator instance.
+
+        Parameters:
+            order (int): Number of integrator and comb stages.
+            factor (int): Decimation factor.
+            channels (int): Number of channels filtered in parallel.
+            scale (float): Quantization steps per input unit (4096 per g is
+                finer than the sensor's resolution in every range).
+        """
+        self.order = order
+        self.factor = factor
+        self.channels = channels
+        self.scale = scale
+        self.gain = float(factor) ** order * scale
+        self.reset()
+
+    def reset(self):
+        """
+        Clear integrator and comb state.
+        """
+        self.integrators = np.zeros((self.order, self.channels), dtype=np.int64)
+        self.combs = np.zeros((self.order, self.channels), dtype=np.int64)
+        self.position = 0
+
+    def process(self, block) -> np.ndarray:
+        """
+        Filter and decimate a block of shape (samples, channels).
+        """
+        y = np.rint(np.asarray(block, dtype=np.float64).reshape(-1, self.channels) * self.scale).astype(np.int64)
+        n = len(y)
+        with np.errstate(over='ignore'):
+            for k in range(self.order):
+                y = np.cumsum(y, axis=0) + self.integrators[k]
+                if n:
+                    self.integrators[k] = y[-1]
+            first = (-self.position) % self.factor
+            y = y[first::self.factor]
+            self.position += n
+            for k in range(self.order):
+                prev = np.concatenate((self.combs[k:k + 1], y[:-1]))
+                if len(y):
+                    self.combs[k] = y[-1]
+                y = y - prev
+        return y / self.gain
+
+
+class FilterChain:
+    """
+    Sequence of streaming filters applied one after another.
+    """
+
+    def __init__(self, stages: list):
+        self.stages = stages
+
+    def reset(self):
+        for stage in self.stages:
+            stage.reset()
+
+    def process(self, block) -> np.ndarray:
+        for stage in self.stages:
+            block = stage.process(block)
+        return block
+
+
+class Decimator:
+    """
+    Keeps every factor-th sample of a stream, tracking the phase across blocks.
+    """
+
+    def __init__(self, factor: int):
+        self.factor = factor
+        self.reset()
+
+    def reset(self):
+        self.position = 0
+
+    def process(self, block) -> np.ndarray:
+        block = np.asarray(block)
+        first = (-self.position) % self.factor
+        self.position += len(block)
+        return block[first::self.factor]
+
+
+class DisplayDecimator:
+    """
+    Anti-aliased decimation of (time, x, y, z) samples for plotting.
+
+    A 4th-order Butterworth low-pass at 40% of the output Nyquist rate runs
+    before every factor-th sample is kept; timestamps are decimated alongside
+    and moved back by the filter's group delay at DC, so the plotted trace
+    lines up with its time axis (at 1600 Hz the delay is about 0.4 s).
+    """
+
+    def __init__(self, factor: int, fs: float, channels: int = 3):
+        self.factor = max(1, int(factor))
+        self.fs = fs
+        self.lowpass = None
+        self.delay = 0.0  # Seconds the filtered values lag their input
+        if self.factor > 1:
+            self.lowpass = BiquadCascade(butterworth('lowpass', 4, fs, 0.4 * fs / (2 * self.factor)), channels)
+            self.delay = self.lowpass.group_delay() / fs
+        self.time_decimator = Decimator(self.factor)
+        self.value_decimator = Decimator(self.factor)
+
+    def process(self, times, values) -> tuple:
+        """
+        Filter and decimate a block.
+
+        Parameters:
+            times (array-like): Sample timestamps.
+            values (array-like): Samples of shape (n, channels).
+
+        Returns:
+            tuple: (times, values) of the kept samples.
+        """
+        values = np.asarray(values, dtype=np.float64)
+        if self.lowpass is not None:
+            values = self.lowpass.process(values)
+        times = self.time_decimator.process(np.asarray(times, dtype=np.float64)) - self.delay
+        return times, self.value_decimator.process(values)
+
+
+def make_filter(kind: str, fs: float, f1: float, f2: float = None, order: int = 4, channels: int = 3) -> BiquadCascade:
+    """
+    Create a Butterworth biquad cascade for the recording pre-stage.
+
+    Parameters:
+        kind (str): 'lowpass', 'highpass' or 'bandpass'.
+        fs (float): Sample rate in Hz.
+        f1 (float): Cutoff frequency, or lower edge for band-pass.
+        f2 (float): Upper edge for band-pass.
+        order (int): Even filter order.
+        channels (int): Number of channels.
+    """
+    return BiquadCascade(butterworth(kind, order, fs, f1, f2), channels)
+
+
+def benchmark(fs: float = 1600.0, seconds: float = 10.0, block: int = 32, channel_counts=(3, 12, 48, 96)) -> list:
+    """
+    Measure per-axis throughput of each filter type at the given sample rate.
+
+    Also checks that block-wise processing matches a single pass exactly.
+
+    Returns:
+        list: (filter name, channels, samples per second per channel, real-time factor) tuples.
+    """
+    n = int(fs * seconds)
+    results = []
+    for channels in channel_counts:
+        data = np.random.default_rng(0).normal(size=(n, channels))
+        makers = {
+            'biquad lowpass x2': lambda: make_filter('lowpass', fs, 100, channels=channels),
+            'biquad bandpass x4': lambda: make_filter('bandpass', fs, 20, 200, channels=channels),
+            'FIR 63 taps /8': lambda: FirDecimator(lowpass_fir(63, fs / 20, fs), 8, channels),
+            'CIC order 3 /8': lambda: CicDecimator(3, 8, channels)
+        }
+        for name, make in makers.items():
+            reference = make().process(data)
+            f = make()
+            t0 = time.perf_counter()
+            out = np.concatenate([f.process(data[i:i + block]) for i in range(0, n, block)])
+            dt = time.perf_counter() - t0
+            if not np.array_equal(out, reference):
+                raise Exception(f"{name}: block-wise output differs from a single pass.")
+            results.append((name, channels, n / dt, seconds / dt))
+    return results
+
+
+if __name__ == '__main__':
+    for name, channels, rate, realtime in benchmark():
+        print(f'{name:>20}, {channels:3d} channels: {rate / 1e3:8.1f} k samples/s per channel, {realtime:7.1f}x real time')
@@ -0,0 +1,538 @@
+"""
+recording_index.py
+
+This module provides a sparse time index for the CSV recordings written by
+SensorApp. The index is stored next to the recording as '<file>.idx.json'
+and holds, for every block of rows, its byte offset, row count, first and
+last timestamp, time range and per-axis minimum and maximum. A time range
+is then found with a binary search and read by seeking straight to its
+first block.
+
+The index is written while recording, and can be built after the fact for
+existing files. Timestamps need not be sorted: lookups search the running
+maximum and the trailing minimum of the block time ranges, so rows stamped
+out of order (as older recordings back-dated within frames) are still found.
+
+Usage:
+    python recording_index.py build FILE
+    python recording_index.py export FILE T0 T1 OUT
+    python recording_index.py bench FILE [--rows N]
+"""
+
+import argparse
+import bisect
+import json
+import os
+import random
+import time
+import warnings
+
+import numpy as np
+
+INDEX_SUFFIX = '.idx.json'
+INDEX_VERSION = 2
+DEFAULT_BLOCK_ROWS = 4096
+CHUNK_BYTES = 1 << 22
+
+
+class IndexBuilder:
+    """
+    Accumulates per-block statistics of data rows as they are written or scanned.
+    """
+
+    def __init__(self, block_rows: int = DEFAULT_BLOCK_ROWS):
+        """
+        Initialize the IndexBuilder instance.
+
+        Parameters:
+            block_rows (int): Number of data rows per index block.
+        """
+        self.block_rows = block_rows
+        self.data_offset = 0
+        self.rows = 0
+        self.offsets = []
+        self.counts = []
+        self.t_first = []
+        self.t_last = []
+        self.t_min = []
+        self.t_max = []
+        self.mins = []
+        self.maxs = []
+
+    def resume(self, index: dict):
+        """
+        Continue an index saved while the recording was still being written.
+        """
+        self.block_rows = index['block_rows']
+        self.data_offset = index['data_offset']
+        self.rows = index['rows']
+        blocks = index['blocks']
+        self.offsets = list(blocks['offset'])
+        self.counts = list(blocks['rows'])
+        self.t_first = list(blocks['t_first'])
+        self.t_last = list(blocks['t_last'])
+        self.t_min = list(blocks['t_min'])
+        self.t_max = list(blocks['t_max'])
+        self.mins = list(blocks['min'])
+        self.maxs = list(blocks['max'])
+
+    def start(self, data_offset: int):
+        """
+        Set the byte offset of the first data row (the end of the CSV header).
+        """
+        self.data_offset = data_offset
+
+    def add_rows(self, offsets, rows):
+        """
+        Add data rows to the index.
+
+        Parameters:
+            offsets (array-like): Byte offset of the start of every row.
+            rows (ndarray): Array of shape (n, 4) holding time, x, y and z.
+        """
+        rows = np.asarray(rows, dtype=np.float64)
+        offsets = np.asarray(offsets, dtype=np.int64)
+        i = 0
+        n = len(rows)
+        while i < n:
+            if not self.counts or self.counts[-1] >= self.block_rows:
+                # Open a new block at this row
+                self.offsets.append(int(offsets[i]))
+                self.counts.append(0)
+                self.t_first.append(float(rows[i, 0]))
+                self.t_last.append(float(rows[i, 0]))
+                self.t_min.append(np.inf)
+                self.t_max.append(-np.inf)
+                self.mins.append([np.inf] * 3)
+                self.maxs.append([-np.inf] * 3)
+            take = min(self.block_rows - self.counts[-1], n - i)
+            seg = rows[i:i + take]
+            self.counts[-1] += take
+            self.t_last[-1] = float(seg[-1, 0])
+            self.t_min[-1] = min(self.t_min[-1], float(seg[:, 0].min()))
+            self.t_max[-1] = max(self.t_max[-1], float(seg[:, 0].max()))
+            self.mins[-1] = np.minimum(self.mins[-1], seg[:, 1:].min(axis=0)).tolist()
+            self.maxs[-1] = np.maximum(self.maxs[-1], seg[:, 1:].max(axis=0)).tolist()
+            i += take
+        self.rows += n
+
+    def finish(self, end_offset: int) -> dict:
+        """
+        Return the index covering the file up to end_offset.
+        """
+        return {
+            'version': INDEX_VERSION,
+            'block_rows': self.block_rows,
+            'data_offset': self.data_offset,
+            'end_offset': end_offset,
+            'rows': self.rows,
+            'blocks': {
+                'offset': self.offsets,
+                'rows': self.counts,
+                't_first': self.t_first,
+                't_last': self.t_last,
+                't_min': self.t_min,
+                't_max': self.t_max,
+                'min': self.mins,
+                'max': self.maxs
+            }
+        }
+
+
+class RecordingIndex:
+    """
+    Loaded time index of one recording, answering range lookups in O(log n).
+    """
+
+    def __init__(self, csv_path: str, index: dict):
+        self.csv_path = csv_path
+        self.data_offset = index['data_offset']
+        self.end_offset = index['end_offset']
+        self.rows = index['rows']
+        blocks = index['blocks']
+        self.offsets = blocks['offset']
+        self.counts = blocks['rows']
+        self.t_first = blocks['t_first']
+        self.t_last = blocks['t_last']
+        self.t_min = blocks['t_min']
+        self.t_max = blocks['t_max']
+        # Both are non-decreasing, so they can be binary-searched even if the times are not
+        self.t_max_before = np.maximum.accumulate(self.t_max).tolist() if self.t_max else []
+        self.t_min_after = np.minimum.accumulate(self.t_min[::-1])[::-1].tolist() if self.t_min else []
+        self.mins = np.array(blocks['min'], dtype=np.float64).reshape(-1, 3)
+        self.maxs = np.array(blocks['max'], dtype=np.float64).reshape(-1, 3)
+
+    @property
+    def start_time(self) -> float:
+        return self.t_min_after[0] if self.t_min_after else None
+
+    @property
+    def end_time(self) -> float:
+        return self.t_max_before[-1] if self.t_max_before else None
+
+    def block_range(self, t0: float, t1: float) -> tuple:
+        """
+        Return the half-open range of blocks that may hold rows between t0 and t1.
+
+        Every block before it ends before t0 and every block after it starts after t1.
+        """
+        first = bisect.bisect_left(self.t_max_before, t0)
+        last = bisect.bisect_right(self.t_min_after, t1)
+        return first, max(first, last)
+
+    def byte_range(self, t0: float, t1: float) -> tuple:
+        """
+        Return the (start, end) byte offsets that cover rows between t0 and t1.
+        """
+        first, last = self.block_range(t0, t1)
+        if first >= len(self.offsets):
+            return self.end_offset, self.end_offset
+        end = self.offsets[last] if last < len(self.offsets) else self.end_offset
+        return self.offsets[first], end
+
+    def envelope(self, t0: float, t1: float) -> tuple:
+        """
+        Return per-block times and min/max for an overview of a range, without reading data.
+
+        Returns:
+            tuple: (t_first, t_last, mins, maxs) arrays, one entry per block.
+        """
+        first, last = self.block_range(t0, t1)
+        return (np.array(self.t_first[first:last]), np.array(self.t_last[first:last]),
+                self.mins[first:last], self.maxs[first:last])
+
+
+def index_path(csv_path: str) -> str:
+    """
+    Return the path of the index sidecar of a recording.
+    """
+    return csv_path + INDEX_SUFFIX
+
+
+def save_index(csv_path: str, index: dict):
+    """
+    Write an index next to its recording.
+
+    The sidecar is replaced in one step, so a crash while saving leaves the previous index.
+    """
+    path = index_path(csv_path)
+    with open(path + '.tmp', 'w') as f:
+        json.dump(index, f)
+    os.replace(path + '.tmp', path)
+
+
+def find_data_offset(f) -> int:
+    """
+    Return the byte offset just after the 'Time,X,Y,Z' header line, or 0 if there is none.
+    """
+    f.seek(0)
+    for _ in range(32):
+        line = f.readline()
+        if not line:
+            break
+        if line.startswith(b'Time,'):
+            return f.tell()
+    return 0
+
+
+def _parse_line(line: bytes) -> list:
+    """
+    Parse one data line into [time, x, y, z], or return None if it is malformed.
+    """
+    fields = line.split(b',')
+    if len(fields) != 4:
+        return None
+    try:
+        return [float(v) for v in fields]
+    except ValueError:
+        return None
+
+
+def parse_rows(data: bytes, base_offset: int = 0) -> tuple:
+    """
+    Parse complete CSV data lines into row offsets and values.
+
+    Lines that are not data rows (comments such as '# config') are skipped,
+    and so are malformed rows, e.g. a row torn by a crash mid-write.
+
+    Parameters:
+        data (bytes): Whole lines, each terminated by a newline.
+        base_offset (int): File offset of data[0].
+
+    Returns:
+        tuple: (offsets, rows) with rows of shape (n, 4).
+    """
+    lines = data.split(b'\n')
+    if lines and not lines[-1]:
+        lines.pop()
+    lengths = np.fromiter((len(line) + 1 for line in lines), dtype=np.int64, count=len(lines))
+    offsets = base_offset + np.concatenate(([0], np.cumsum(lengths)[:-1])) if len(lines) else np.zeros(0, np.int64)
+    if b'#' in data or b'Time' in data or data.count(b',') != 3 * len(lines):
+        keep = [i for i, line in enumerate(lines)
+                if line[:1] not in (b'#', b'T') and line.count(b',') == 3]
+        lines = [lines[i] for i in keep]
+        offsets = offsets[keep]
+    if not lines:
+        return offsets, np.zeros((0, 4))
+    text = b','.join(lines).replace(b'\r', b'').decode('ascii', 'replace')
+    with warnings.catch_warnings():
+        # fromstring only warns on a field it cannot parse, and returns the values before it
+        warnings.simplefilter('error', DeprecationWarning)
+        try:
+            values = np.fromstring(text, dtype=np.float64, sep=',')
+        except (DeprecationWarning, ValueError):
+            values = None
+    if values is None or len(values) != 4 * len(lines):
+        parsed = [_parse_line(line.replace(b'\r', b'')) for line in lines]
+        keep = [i for i, row in enumerate(parsed) if row is not None]
+        offsets = offsets[keep]
+        values = np.array([parsed[i] for i in keep], dtype=np.float64)
+    return offsets, values.reshape(-1, 4)
+
+
+def iter_chunks(f, start: int, end: int, chunk_bytes: int = CHUNK_BYTES):
+    """
+    Yield (offset, data) chunks of whole lines between two byte offsets.
+
+    A final line without a newline, as left by a crash mid-write, is dropped.
+    """
+    f.seek(start)
+    pos = start
+    pending = b''
+    while pos < end:
+        data = f.read(min(chunk_bytes, end - pos))
+        if not data:
+            break
+        pos += len(data)
+        data = pending + data
+        cut = data.rfind(b'\n') + 1
+        if cut == 0:
+            pending = data
+            continue
+        yield pos - len(data), data[:cut]
+        pending = data[cut:]
+
+
+def build_index(csv_path: str, block_rows: int = DEFAULT_BLOCK_ROWS, save: bool = True, partial: dict = None) -> dict:
+    """
+    Build the index of an existing recording by scanning it once.
+
+    Parameters:
+        csv_path (str): Path of the CSV recording.
+        block_rows (int): Number of data rows per index block.
+        save (bool): Write the index sidecar.
+        partial (dict): Index of the beginning of the file, e.g. saved while
+            recording before a crash; only the rest of the file is scanned.
+
+    Returns:
+        dict: The index.
+    """
+    builder = IndexBuilder(block_rows)
+    with open(csv_path, 'rb') as f:
+        if partial is not None:
+            builder.resume(partial)
+            start = partial['end_offset']
+        else:
+            start = find_data_offset(f)
+            builder.start(start)
+        end = os.fstat(f.fileno()).st_size
+        for offset, data in iter_chunks(f, start, end):
+            builder.add_rows(*parse_rows(data, offset))
+    index = builder.finish(end)
+    if save:
+        save_index(csv_path, index)
+    return index
+
+
+def load_index(csv_path: str, build: bool = True) -> RecordingIndex:
+    """
+    Load the index of a recording, building or refreshing it if needed.
+
+    An index that covers only the beginning of the file (saved while
+    recording, or before the recording grew) is extended with the rest, and
+    a missing or outdated one is rebuilt, when build is True.
+    """
+    partial = None
+    try:
+        with open(index_path(csv_path)) as f:
+            index = json.load(f)
+        size = os.path.getsize(csv_path)
+        if index.get('version') != INDEX_VERSION or index['end_offset'] > size:
+            index = None
+        elif index['end_offset'] < size:
+            partial, index = index, None
+    except (OSError, ValueError):
+        index = None
+    if index is None:
+        if not build:
+            raise Exception(f"No up-to-date index for {csv_path}.")
+        index = build_index(csv_path, partial=partial)
+    return RecordingIndex(csv_path, index)
+
+
+def read_range(csv_path: str, t0: float, t1: float, index: RecordingIndex = None) -> np.ndarray:
+    """
+    Read the rows with t0 <= time <= t1.
+
+    Returns:
+        ndarray: Array of shape (n, 4) holding time, x, y and z.
+    """
+    index = index or load_index(csv_path)
+    start, end = index.byte_range(t0, t1)
+    parts = []
+    with open(csv_path, 'rb') as f:
+        for offset, data in iter_chunks(f, start, end):
+            _, rows = parse_rows(data, offset)
+            parts.append(rows[(rows[:, 0] >= t0) & (rows[:, 0] <= t1)])
+    return np.concatenate(parts) if parts else np.zeros((0, 4))
+
+
+def export_range(csv_path: str, out_path: str, t0: float, t1: float, index: RecordingIndex = None) -> int:
+    """
+    Write the rows with t0 <= time <= t1 to a new CSV file with the original header.
+
+    Only the first and last blocks of the range are parsed; the blocks in
+    between are copied byte for byte.
+
+    Returns:
+        int: Number of bytes written.
+    """
+    index = index or load_index(csv_path)
+    first, last = index.block_range(t0, t1)
+    edges = index.offsets[first:last] + [index.offsets[last] if last < len(index.offsets) else index.end_offset]
+    written = 0
+    with open(csv_path, 'rb') as src, open(out_path, 'wb') as dst:
+        written += dst.write(src.read(index.data_offset))
+        for i in range(len(edges) - 1):
+            block = first + i
+            inside = index.t_min[block] >= t0 and index.t_max[block] <= t1
+            if inside:
+                src.seek(edges[i])
+                remaining = edges[i + 1] - edges[i]
+                while remaining > 0:
+                    data = src.read(min(CHUNK_BYTES, remaining))
+                    remaining -= len(data)
+                    written += dst.write(data)
+            else:
+                for _, data in iter_chunks(src, edges[i], edges[i + 1]):
+                    for line in data.splitlines(keepends=True):
+                        if line[:1] == b'#':
+                            continue
+                        t = float(line.split(b',', 1)[0])
+                        if t0 <= t <= t1:
+                            written += dst.write(line)
+    return written
+
+
+def plot_range(csv_path: str, t0: float, t1: float, max_rows: int = 200000, index: RecordingIndex = None):
+    """
+    Plot a time range of a recording in a new PyQtGraph window.
+
+    Ranges with more than max_rows rows are drawn from the per-block min/max
+    envelope of the index instead of the raw rows.
+
+    Returns:
+        PlotWidget: The plot window.
+    """
+    import pyqtgraph as pg
+
+    index = index or load_index(csv_path)
+    first, last = index.block_range(t0, t1)
+    plot = pg.plot(title=f'{os.path.basename(csv_path)} [{t0:g} s, {t1:g} s]')
+    plot.setLabel('left', 'Acceleration', units='g')
+    plot.setLabel('bottom', 'Time', units='s')
+    colors = ('r', 'g', 'b')
+    if sum(index.counts[first:last]) > max_rows:
+        t_first, t_last, mins, maxs = index.envelope(t0, t1)
+        t = np.column_stack((t_first, t_last)).ravel()
+        for axis, color in enumerate(colors):
+            plot.plot(t, np.column_stack((mins[:, axis], maxs[:, axis])).ravel(), pen=pg.mkPen(color))
+    else:
+        rows = read_range(csv_path, t0, t1, index)
+        for axis, color in enumerate(colors):
+            plot.plot(rows[:, 0], rows[:, axis + 1], pen=pg.mkPen(color))
+    return plot
+
+
+def synthesize(csv_path: str, rows: int, rate: float = 1600.0):
+    """
+    Write a synthetic recording with the SensorApp layout, for benchmarks.
+    """
+    with open(csv_path, 'wb') as f:
+        f.write(b'Sensor Name:,kionix\r\nScale Range:,2\r\nSerial Port:,bench\r\n')
+        f.write(f'File Name:,{os.path.basename(csv_path)}\r\nTime,X,Y,Z\r\n'.encode())
+        rng = np.random.default_rng(0)
+        for start in range(0, rows, 1 << 18):
+            n = min(1 << 18, rows - start)
+            t = (start + np.arange(n)) / rate
+            data = np.column_stack((t, rng.normal(0, 0.05, (n, 3)) + [0, 0, 1]))
+            f.write(''.join(f'{a!r},{b!r},{c!r},{d!r}\r\n' for a, b, c, d in data.tolist()).encode())
+
+
+def benchmark(csv_path: str, lookups: int = 200, span: float = 1.0) -> dict:
+    """
+    Measure index build, seek latency of random slices and slice export on a recording.
+
+    Returns:
+        dict: Timings in seconds and sizes in bytes.
+    """
+    results = {'file_bytes': os.path.getsize(csv_path)}
+    t = time.perf_counter()
+    build_index(csv_path)
+    results['build_s'] = time.perf_counter() - t
+    t = time.perf_counter()
+    index = load_index(csv_path)
+    results['load_s'] = time.perf_counter() - t
+
+    rng = random.Random(0)
+    starts = [rng.uniform(index.start_time, max(index.start_time, index.end_time - span)) for _ in range(lookups)]
+    t = time.perf_counter()
+    for t0 in starts:
+        index.byte_range(t0, t0 + span)
+    results['lookup_s'] = (time.perf_counter() - t) / lookups
+    t = time.perf_counter()
+    for t0 in starts:
+        read_range(csv_path, t0, t0 + span, index)
+    results['read_slice_s'] = (time.perf_counter() - t) / lookups
+
+    mid = (index.start_time + index.end_time) / 2
+    out_path = csv_path + '.slice.csv'
+    t = time.perf_counter()
+    results['export_bytes'] = export_range(csv_path, out_path, mid - 60, mid + 60, index)
+    results['export_s'] = time.perf_counter() - t
+    os.remove(out_path)
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Time index for SensorApp recordings.')
+    sub = parser.add_subparsers(dest='command', required=True)
+    p = sub.add_parser('build', help='build the index of a recording')
+    p.add_argument('file')
+    p.add_argument('--block-rows', type=int, default=DEFAULT_BLOCK_ROWS)
+    p = sub.add_parser('export', help='export a time range to a new CSV file')
+    p.add_argument('file')
+    p.add_argument('t0', type=float)
+    p.add_argument('t1', type=float)
+    p.add_argument('out')
+    p = sub.add_parser('bench', help='benchmark seek and export (synthesizes FILE if missing)')
+    p.add_argument('file')
+    p.add_argument('--rows', type=int, default=20_000_000)
+    args = parser.parse_args()
+
+    if args.command == 'build':
+        index = build_index(args.file, args.block_rows)
+        print(f"{index['rows']} rows in {len(index['blocks']['offset'])} blocks")
+    elif args.command == 'export':
+        print(f'{export_range(args.file, args.out, args.t0, args.t1)} bytes written')
+    else:
+        if not os.path.exists(args.file):
+            synthesize(args.file, args.rows)
+        r = benchmark(args.file)
+        print(f"file {r['file_bytes'] / 1e9:.2f} GB, build {r['build_s']:.1f} s, load {r['load_s'] * 1e3:.1f} ms")
+        print(f"lookup {r['lookup_s'] * 1e6:.1f} us, 1 s slice read {r['read_slice_s'] * 1e3:.2f} ms")
+        print(f"120 s slice export {r['export_bytes'] / 1e6:.1f} MB in {r['export_s'] * 1e3:.1f} ms")
+
+
+if __name__ == '__main__':
+    main()
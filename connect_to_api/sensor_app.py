@@ -12,14 +12,23 @@ import csv
 import os
 import threading
 import queue
+import json
 import numpy as np
 
 from PyQt5 import QtWidgets, QtCore
 import pyqtgraph as pg
 
-from serial_comm import SerialComm
+from serial_comm import SerialComm, SampleClock
+from serial_supervisor import SerialSupervisor
+from timing_monitor import TimingMonitor
+from recording_index import IndexBuilder, save_index
+from filters import DisplayDecimator, make_filter
+from rolling_stats import RollingStats
 import gui_utils
 
+# Seconds between saves of the time index while recording, so a crash leaves most of it
+INDEX_SAVE_INTERVAL = 30.0
+
 
 class SensorApp(QtWidgets.QWidget):
     """
@@ -35,6 +44,10 @@ class SensorApp(QtWidgets.QWidget):
 
         # Buffers for decimation (raw points for aggregation)
         self.decimation_buffer = []  # Will hold tuples of (time, x, y, z)
+        self.display_decimator = None  # Anti-aliasing filter and decimation for the plot
+        # Rolling mean/std/min/max per axis and magnitude over several windows (seconds)
+        self.stats_windows = (1.0, 5.0, 30.0)
+        self.rolling_stats = RollingStats(1.0, self.stats_windows)
 
         # Buffers for plotting (after decimation)
         self.plot_time = []
@@ -49,6 +62,18 @@ class SensorApp(QtWidgets.QWidget):
         self.save_file_path = ''
         self.is_saving = False
         self.start_time_saving = None
+        self.save_file = None  # Open recording file (binary append mode)
+        self.index_builder = None  # Time index of the recording, built while writing
+        self.index_saved_at = 0.0  # When the index of the recording was last saved
+        self.save_lock = threading.Lock()  # Serializes recording writes with start/stop
+        self.record_filter_spec = None  # (kind, f1, f2) of the recording pre-filter
+        self.record_filter = None  # Filter applied to recorded samples, None for raw data
+
+        # Sample-timing monitors for the live session and the current recording
+        self.timing_monitor = TimingMonitor(1.0)
+        self.recording_monitor = TimingMonitor(1.0)
+        self.sample_clock = SampleClock(1.0)  # Timestamps samples from their sequence numbers
+        self.recording_gaps = 0  # Reconnections during the current recording
 
         # دیکشنری نگاشت مقادیر DOR به odr
         self.dor_to_odr = {
@@ -67,6 +92,8 @@ class SensorApp(QtWidgets.QWidget):
         }
         # متغیر odr برای ذخیره مقدار انتخاب شده
         self.odr = None
+        # Selected output data rate in Hz, used to timestamp binary frames
+        self.sample_rate = 1.0
 
         # دیکشنری نگاشت odr به decimation factor برای کاهش تعداد نقاط نمودار
         self.decimation_mapping = {
@@ -84,6 +111,14 @@ class SensorApp(QtWidgets.QWidget):
             2048: 320
         }
 
+        # Recording filter choices (cutoff for low/high-pass, both edges for band-pass)
+        self.filter_types = {
+            'None': None,
+            'Low-pass': 'lowpass',
+            'High-pass': 'highpass',
+            'Band-pass': 'bandpass'
+        }
+
         self.init_ui()
 
     def init_ui(self):
@@ -107,6 +142,7 @@ class SensorApp(QtWidgets.QWidget):
         scale_label = QtWidgets.QLabel('Sensor Scale:')
         self.scale_combo = QtWidgets.QComboBox()
         self.scale_combo.addItems(['2', '4', '8', '16'])
+        self.scale_combo.currentIndexChanged.connect(self.settings_changed)
         input_layout.addWidget(scale_label)
         input_layout.addWidget(self.scale_combo)
 
@@ -125,6 +161,7 @@ class SensorApp(QtWidgets.QWidget):
         self.dor_combo = QtWidgets.QComboBox()
         # اضافه کردن مقادیر قابل انتخاب به صورت رشته
         self.dor_combo.addItems(list(self.dor_to_odr.keys()))
+        self.dor_combo.currentIndexChanged.connect(self.settings_changed)
         input_layout.addWidget(dor_label)
         input_layout.addWidget(self.dor_combo)
 
@@ -142,6 +179,20 @@ class SensorApp(QtWidgets.QWidget):
         self.plot_widget.setLabel('bottom', 'Time', units='s')
         main_layout.addWidget(self.plot_widget)
 
+        # Sample-timing quality of the live stream
+        self.timing_label = QtWidgets.QLabel('Rate: -')
+        main_layout.addWidget(self.timing_label)
+
+        # Rolling statistics over the selected window
+        stats_layout = QtWidgets.QHBoxLayout()
+        stats_layout.addWidget(QtWidgets.QLabel('Stats Window:'))
+        self.stats_window_combo = QtWidgets.QComboBox()
+        self.stats_window_combo.addItems([f'{w:g} s' for w in self.stats_windows])
+        stats_layout.addWidget(self.stats_window_combo)
+        self.stats_label = QtWidgets.QLabel('')
+        stats_layout.addWidget(self.stats_label, 1)
+        main_layout.addLayout(stats_layout)
+
         # Plot curves for X, Y, Z axes
         self.curve_x = self.plot_widget.plot(pen=pg.mkPen(color='r', width=2), name='X')
         self.curve_y = self.plot_widget.plot(pen=pg.mkPen(color='g', width=2), name='Y')
@@ -160,6 +211,22 @@ class SensorApp(QtWidgets.QWidget):
         self.file_path_label = QtWidgets.QLabel('File Path:')
         save_layout.addWidget(self.file_path_label)
 
+        # Optional filter applied to the recorded samples
+        save_layout.addWidget(QtWidgets.QLabel('Record Filter:'))
+        self.filter_combo = QtWidgets.QComboBox()
+        self.filter_combo.addItems(list(self.filter_types.keys()))
+        save_layout.addWidget(self.filter_combo)
+        self.filter_f1_spin = QtWidgets.QDoubleSpinBox()
+        self.filter_f1_spin.setRange(0.01, 800)
+        self.filter_f1_spin.setValue(10)
+        self.filter_f1_spin.setSuffix(' Hz')
+        save_layout.addWidget(self.filter_f1_spin)
+        self.filter_f2_spin = QtWidgets.QDoubleSpinBox()
+        self.filter_f2_spin.setRange(0.01, 800)
+        self.filter_f2_spin.setValue(100)
+        self.filter_f2_spin.setSuffix(' Hz')
+        save_layout.addWidget(self.filter_f2_spin)
+
         # Start/Stop saving button
         self.start_button = QtWidgets.QPushButton('Start')
         self.start_button.clicked.connect(self.start_stop_saving)
@@ -191,8 +258,19 @@ class SensorApp(QtWidgets.QWidget):
         Start or stop saving sensor data to a file.
         """
         if not self.is_saving:
+            kind = self.filter_types[self.filter_combo.currentText()]
+            self.record_filter_spec = None
+            if kind is not None:
+                self.record_filter_spec = (kind, self.filter_f1_spin.value(), self.filter_f2_spin.value())
+            try:
+                self.record_filter = self.make_record_filter()
+            except ValueError as e:
+                gui_utils.show_error_message(str(e), self)
+                return
+
             # Start saving
-            self.is_saving = True
+            self.recording_monitor = TimingMonitor(self.sample_rate)
+            self.recording_gaps = 0
             self.start_time_saving = None  # Reset start time for saving
             self.start_button.setText('Stop')
 
@@ -203,15 +281,140 @@ class SensorApp(QtWidgets.QWidget):
                 csvwriter.writerow(['Scale Range:', self.scale_combo.currentText()])
                 csvwriter.writerow(['Serial Port:', self.port_combo.currentText()])
                 csvwriter.writerow(['File Name:', os.path.basename(self.save_file_path)])
+                if self.record_filter_spec:
+                    csvwriter.writerow(['Filter:', self.describe_record_filter()])
                 csvwriter.writerow(['Time', 'X', 'Y', 'Z'])
+
+            # Keep the file open for the data rows and index them as they are written
+            with self.save_lock:
+                self.save_file = open(self.save_file_path, 'ab')
+                self.index_builder = IndexBuilder()
+                self.index_builder.start(self.save_file.tell())
+                self.is_saving = True
+                # Replaces the index of an earlier file with the same name
+                self.save_partial_index()
         else:
             # Stop saving
-            self.is_saving = False
+            self.finish_recording()
             self.start_button.setText('Start')
             QtWidgets.QMessageBox.information(
                 self, "Saving Completed", f"Data saved to file:\n{self.save_file_path}"
             )
 
+    def make_record_filter(self):
+        """
+        Create the recording pre-filter for the current sample rate.
+
+        Returns:
+            BiquadCascade: The filter, or None when recording raw data.
+
+        Raises:
+            ValueError: If the cutoff frequencies do not fit the sample rate.
+        """
+        if self.record_filter_spec is None:
+            return None
+        kind, f1, f2 = self.record_filter_spec
+        return make_filter(kind, self.sample_rate, f1, f2)
+
+    def describe_record_filter(self):
+        """
+        Return a short description of the recording pre-filter.
+        """
+        if self.record_filter_spec is None:
+            return 'none'
+        kind, f1, f2 = self.record_filter_spec
+        if kind == 'bandpass':
+            return f'Butterworth band-pass {f1:g}-{f2:g} Hz'
+        return f'Butterworth {kind} {f1:g} Hz'
+
+    def write_rows(self, rows):
+        """
+        Append data rows to the recording and add them to its time index.
+
+        Parameters:
+            rows (list): [time, x, y, z] rows.
+        """
+        with self.save_lock:
+            if not self.is_saving:
+                return
+            offset = self.save_file.tell()
+            lines = [f'{t},{x},{y},{z}\r\n'.encode() for t, x, y, z in rows]
+            offsets = np.cumsum([offset] + [len(line) for line in lines[:-1]])
+            try:
+                self.save_file.write(b''.join(lines))
+            except Exception as e:
+                print("Error writing to CSV:", e)
+                return
+            self.index_builder.add_rows(offsets, rows)
+            if time.time() - self.index_saved_at >= INDEX_SAVE_INTERVAL:
+                self.save_partial_index()
+
+    def save_partial_index(self):
+        """
+        Save the index of the rows written so far; called with save_lock held.
+
+        load_index extends such an index over the rest of the file, so a
+        recording that ends in a crash is indexed without a full scan.
+        """
+        self.index_saved_at = time.time()
+        try:
+            self.save_file.flush()
+            save_index(self.save_file_path, self.index_builder.finish(self.save_file.tell()))
+        except Exception as e:
+            print("Error writing recording index:", e)
+
+    def write_marker(self, fields):
+        """
+        Append a comment row (first field starting with '#') to the recording.
+        """
+        with self.save_lock:
+            if self.is_saving:
+                try:
+                    self.save_file.write((','.join(fields) + '\r\n').encode())
+                except Exception as e:
+                    print("Error writing to CSV:", e)
+
+    def finish_recording(self):
+        """
+        Close the recording and write its time index and metadata sidecars.
+        """
+        with self.save_lock:
+            if not self.is_saving:
+                return
+            self.is_saving = False
+            try:
+                end = self.save_file.tell()
+                self.save_file.close()
+                save_index(self.save_file_path, self.index_builder.finish(end))
+            except Exception as e:
+                print("Error writing recording index:", e)
+            self.save_file = None
+            self.index_builder = None
+        self.write_recording_metadata()
+
+    def write_recording_metadata(self):
+        """
+        Write the recording settings and its sample-timing statistics next to the CSV file.
+
+        The metadata goes to '<file>.meta.json' so the CSV layout stays unchanged.
+        """
+        metadata = {
+            'sensor_name': self.sensor_combo.currentText(),
+            'scale_range': self.scale_range if self.serial_comm else self.scale_combo.currentText(),
+            'serial_port': self.port_combo.currentText(),
+            'data_output_rate_hz': self.sample_rate,
+            'codec': self.serial_comm.codec if self.serial_comm else None,
+            'filter': self.describe_record_filter(),
+            'start_time': self.start_time_saving,
+            'gaps': self.recording_gaps,
+            'timing': self.recording_monitor.summary()
+        }
+        try:
+            with open(self.save_file_path + '.meta.json', 'w') as f:
+                json.dump(metadata, f, indent=2)
+        except Exception as e:
+            print("Error writing recording metadata:", e)
+
     def connect_clicked(self):
         """
         Handle the connect button click event.
@@ -224,10 +427,16 @@ class SensorApp(QtWidgets.QWidget):
         dor_value = self.dor_combo.currentText()
         odr = self.dor_to_odr[dor_value]
         self.odr = odr  # ذخیره odr در متغیر نمونه
+        self.sample_rate = float(dor_value)
+        self.timing_monitor = TimingMonitor(self.sample_rate)
+        self.sample_clock = SampleClock(self.sample_rate)
+        self.display_decimator = DisplayDecimator(self.decimation_mapping.get(odr, 5), self.sample_rate)
+        self.rolling_stats.reset(self.sample_rate)
 
         try:
             # ارسال مقدار odr به عنوان پارامتر سوم به SerialComm
-            self.serial_comm = SerialComm(sensor_name, scale_range, odr, usb_port)
+            # The supervisor reconnects on its own if the stream stops
+            self.serial_comm = SerialSupervisor(SerialComm(sensor_name, scale_range, odr, usb_port))
             self.serial_comm.connect()
 
             # Set sensor scale and adjust plot Y-axis range
@@ -252,10 +461,65 @@ class SensorApp(QtWidgets.QWidget):
         except Exception as e:
             gui_utils.show_error_message(str(e), self)
 
+    def settings_changed(self):
+        """
+        Apply a new scale or DOR selection to the running stream.
+
+        The device re-initializes the sensor in-band, so the connection,
+        buffers and plot are kept. The switch itself is applied in order with
+        the data once the device acknowledges it (see read_serial_data).
+        """
+        if not self.serial_comm or not self.serial_comm.supports_live_config:
+            return
+        scale_range = int(self.scale_combo.currentText())
+        odr = self.dor_to_odr[self.dor_combo.currentText()]
+        try:
+            self.serial_comm.reconfigure(scale_range, odr)
+        except Exception as e:
+            gui_utils.show_error_message(str(e), self)
+
+    def apply_config(self, scale_range, odr):
+        """
+        Switch plot range and decimation to a configuration acknowledged by the device.
+
+        Called from update_plot when the configuration marker is dequeued, so
+        points measured before the switch are still decimated with the old factor.
+        """
+        # Process the samples taken before the switch with the old settings
+        self.process_pending()
+        self.odr = odr
+        self.scale_range = scale_range
+        self.display_decimator = DisplayDecimator(self.decimation_mapping.get(odr, 5), self.odr_to_hz(odr))
+        self.rolling_stats.reset(self.odr_to_hz(odr))
+        self.plot_widget.setYRange(-self.scale_range, self.scale_range)
+
+    def apply_gap(self, start):
+        """
+        Break the plotted lines at a dropout and restart the display filter after it.
+
+        Parameters:
+            start (float): Plot time of the last sample before the dropout.
+        """
+        self.process_pending()
+        self.plot_time.append(start)
+        self.plot_x.append(np.nan)
+        self.plot_y.append(np.nan)
+        self.plot_z.append(np.nan)
+        self.display_decimator = DisplayDecimator(self.decimation_mapping.get(self.odr, 5), self.odr_to_hz(self.odr))
+
+    def odr_to_hz(self, odr):
+        """
+        Return the output data rate in Hz of an odr value.
+        """
+        return next((float(k) for k, v in self.dor_to_odr.items() if v == odr), self.sample_rate)
+
     def disconnect_clicked(self):
         """
         Handle the disconnect button click event.
         """
+        # Finish a running recording while the connection details are still known
+        self.finish_recording()
+
         if self.serial_comm:
             self.serial_comm.disconnect()
             self.serial_comm = None
@@ -282,72 +546,138 @@ class SensorApp(QtWidgets.QWidget):
 
         # Disable Start button for saving
         self.start_button.setEnabled(False)
-        self.is_saving = False
         self.start_button.setText('Start')
 
     def read_serial_data(self):
         """
         Continuously read serial data in a separate thread and put valid data into a queue.
-        Additionally, if saving is enabled, write each received data row to the CSV file immediately,
-        with the timestamp of the actual read time.
-        """
-        while self.serial_comm and self.serial_comm.ser is not None:
-            data = self.serial_comm.read_line()
-            if data:
-                values = data.split()
-                if len(values) == 3:
-                    try:
-                        x, y, z = map(float, values)
-                        t = time.time() - self.start_time
-                        # ذخیره فوری در فایل به محض دریافت داده
-                        if self.is_saving:
-                            if self.start_time_saving is None:
-                                self.start_time_saving = time.time()
-                            elapsed = time.time() - self.start_time_saving
-                            try:
-                                with open(self.save_file_path, 'a', newline='') as csvfile:
-                                    csvwriter = csv.writer(csvfile)
-                                    csvwriter.writerow([elapsed, x, y, z])
-                            except Exception as e:
-                                print("Error writing to CSV:", e)
-                        # قرار دادن داده در صف برای آپدیت نمودار
-                        self.data_queue.put((t, x, y, z))
-                    except Exception as e:
-                        print("Error parsing data:", e)
-            else:
+        Additionally, if saving is enabled, write each received block of rows to the CSV file immediately,
+        timestamped by SampleClock from the frame sequence numbers.
+        """
+        comm = self.serial_comm
+        config_version = comm.config_version if comm else 0
+        while comm is not None and comm is self.serial_comm and comm.ser is not None:
+            try:
+                blocks = comm.read_blocks()
+            except Exception as e:
+                print("Error reading data:", e)
+                break
+            for gap in comm.pop_gaps():
+                # The stream was restored after a dropout; the gap precedes these blocks
+                self.handle_gap(gap)
+            self.queue_blocks(blocks)
+            if comm.config_version != config_version:
+                # The device acknowledged a new range/ODR; every block above predates it
+                config_version = comm.config_version
+                self.handle_config_change(comm.scale_range, comm.odr)
+            elif not blocks:
                 time.sleep(0.01)  # جلوگیری از مصرف بیش از حد CPU
 
+    def queue_blocks(self, blocks):
+        """
+        Timestamp decoded blocks, put them into the plot queue and append them to the CSV file.
+
+        Binary frames arrive in bursts with varying delay, so samples are
+        timestamped from their sequence numbers (see SampleClock), never
+        going backwards in time.
+        """
+        if not blocks:
+            return
+        now = time.time()
+        # Start may be clicked at any time: take one consistent view of the recording state
+        with self.save_lock:
+            saving = self.is_saving
+            if saving and self.start_time_saving is None:
+                self.start_time_saving = now
+            start_time_saving = self.start_time_saving
+        rows = []
+        for (seq, samples), (times, _) in zip(blocks, self.sample_clock.stamp(blocks, now)):
+            # The anchored host timestamps carry the device clock's drift against the arrivals
+            self.timing_monitor.update(times, seq, samples)
+            if saving:
+                self.recording_monitor.update(times, seq, samples)
+            for t_read, (x, y, z) in zip(times.tolist(), samples):
+                # قرار دادن داده در صف برای آپدیت نمودار
+                self.data_queue.put((t_read - self.start_time, x, y, z))
+            if saving:
+                values = np.asarray(samples, dtype=np.float64)
+                record_filter = self.record_filter
+                if record_filter is not None:
+                    values = record_filter.process(values)
+                rows.extend(np.column_stack((times - start_time_saving, values)).tolist())
+        # ذخیره فوری در فایل به محض دریافت داده
+        if rows:
+            self.write_rows(rows)
+
+    def handle_config_change(self, scale_range, odr):
+        """
+        Queue a configuration marker after the blocks measured with the old configuration.
+
+        Runs in the data acquisition thread. The marker keeps the switch in
+        order with the data for update_plot and is recorded in the CSV file.
+        """
+        hz = self.odr_to_hz(odr)
+        self.sample_rate = hz
+        self.sample_clock.set_rate(hz)
+        self.timing_monitor.set_rate(hz)
+        self.recording_monitor.set_rate(hz)
+        self.data_queue.put(('config', scale_range, odr))
+        self.write_marker(['# config', f'scale={scale_range}', f'dor={hz:g}'])
+        try:
+            self.record_filter = self.make_record_filter()
+        except ValueError as e:
+            # The cutoff no longer fits the new rate: keep recording raw data
+            print("Recording filter disabled:", e)
+            self.record_filter_spec = None
+            self.record_filter = None
+            self.write_marker(['# filter', 'none'])
+
+    def handle_gap(self, gap):
+        """
+        Mark a dropout that the supervisor recovered from in the plot and the recording.
+
+        Runs in the data acquisition thread before the first blocks after the gap are queued.
+
+        Parameters:
+            gap (dict): 'start', 'end', 'reason' and 'attempts' from SerialSupervisor.pop_gaps.
+        """
+        print(f"Stream restored after {(gap['end'] - gap['start']) * 1000:.0f} ms ({gap['reason']})")
+        # The device restarts its sequence numbers, and filter state from before the gap is stale
+        self.sample_clock.reset()
+        self.timing_monitor.reset_sequence()
+        self.recording_monitor.reset_sequence()
+        if self.record_filter is not None:
+            self.record_filter.reset()
+        self.data_queue.put(('gap', gap['start'] - self.start_time, gap['end'] - self.start_time))
+        with self.save_lock:
+            start_time_saving = self.start_time_saving if self.is_saving else None
+        if start_time_saving is not None:
+            self.recording_gaps += 1
+            self.write_marker(['# gap', f"start={gap['start'] - start_time_saving:.6f}",
+                               f"end={gap['end'] - start_time_saving:.6f}", f"reason={gap['reason']}"])
+
     def update_plot(self):
         """
-        Process new data from the queue, perform decimation (grouping data points according to the selected odr),
+        Process new data from the queue, perform anti-aliased decimation (according to the selected odr),
         and update the plot.
         """
         # پردازش تمامی داده‌های موجود در صف
         while not self.data_queue.empty():
             try:
-                t, x, y, z = self.data_queue.get_nowait()
+                item = self.data_queue.get_nowait()
             except queue.Empty:
                 break
-
+            if item[0] == 'config':
+                self.apply_config(item[1], item[2])
+                continue
+            if item[0] == 'gap':
+                self.apply_gap(item[1])
+                continue
             # افزودن داده به بافر decimation
-            self.decimation_buffer.append((t, x, y, z))
-
-            # تعیین decimation factor بر اساس odr انتخاب شده
-            decimation_factor = self.decimation_mapping.get(self.odr, 5)
-
-            # اگر تعداد داده‌های موجود در بافر به مقدار decimation_factor رسید،
-            # میانگین آن‌ها گرفته شده و به عنوان یک نقطه برای نمودار استفاده می‌شود.
-            if len(self.decimation_buffer) >= decimation_factor:
-                group = self.decimation_buffer[:decimation_factor]
-                self.decimation_buffer = self.decimation_buffer[decimation_factor:]
-                avg_t = sum(pt[0] for pt in group) / len(group)
-                avg_x = sum(pt[1] for pt in group) / len(group)
-                avg_y = sum(pt[2] for pt in group) / len(group)
-                avg_z = sum(pt[3] for pt in group) / len(group)
-                self.plot_time.append(avg_t)
-                self.plot_x.append(avg_x)
-                self.plot_y.append(avg_y)
-                self.plot_z.append(avg_z)
+            self.decimation_buffer.append(item)
+
+        # Rolling statistics, anti-aliasing filter and decimation according to the selected odr
+        self.process_pending()
 
         # حذف نقاط decimated قدیمی‌تر از 5 ثانیه
         current_time = time.time() - self.start_time
@@ -367,11 +697,35 @@ class SensorApp(QtWidgets.QWidget):
         self.plot_y = new_plot_y
         self.plot_z = new_plot_z
 
+        self.timing_label.setText(self.timing_monitor.status_text())
+        self.stats_label.setText(self.rolling_stats.status_text(self.stats_windows[self.stats_window_combo.currentIndex()]))
+
         # به‌روزرسانی نمودار با استفاده از آرایه‌های NumPy
         if self.plot_time:
-            self.curve_x.setData(np.array(self.plot_time), np.array(self.plot_x))
-            self.curve_y.setData(np.array(self.plot_time), np.array(self.plot_y))
-            self.curve_z.setData(np.array(self.plot_time), np.array(self.plot_z))
+            # NaN points mark dropouts and break the lines
+            self.curve_x.setData(np.array(self.plot_time), np.array(self.plot_x), connect='finite')
+            self.curve_y.setData(np.array(self.plot_time), np.array(self.plot_y), connect='finite')
+            self.curve_z.setData(np.array(self.plot_time), np.array(self.plot_z), connect='finite')
+
+    def process_pending(self):
+        """
+        Feed the buffered raw points to the rolling statistics and the display decimator,
+        and append the decimated points to the plot buffers.
+
+        The decimator low-pass filters before keeping every n-th point, with
+        its state carried across calls, instead of averaging groups of points.
+        """
+        if not self.decimation_buffer or self.display_decimator is None:
+            self.decimation_buffer = []
+            return
+        block = np.array(self.decimation_buffer, dtype=np.float64)
+        self.decimation_buffer = []
+        self.rolling_stats.update(block[:, 1:])
+        times, values = self.display_decimator.process(block[:, 0], block[:, 1:])
+        self.plot_time.extend(times.tolist())
+        self.plot_x.extend(values[:, 0].tolist())
+        self.plot_y.extend(values[:, 1].tolist())
+        self.plot_z.extend(values[:, 2].tolist())
 
     def closeEvent(self, event):
         """
@@ -7,13 +7,306 @@ and sensor initialization using the provided API commands.
 
 import serial
 import time
+import numpy as np
+
+# Binary frame layout shared with API.py on the device
+FRAME_MAGIC = b'\xa5\x5a'
+FRAME_HEADER_LEN = 8
+SEQ_MODULO = 1 << 16  # Frame sequence numbers are 16-bit and wrap around
+CODEC_ID = {
+    'control': 0,
+    'pack': 1,
+    'delta': 2
+}
+CODEC_NAME = {v: k for k, v in CODEC_ID.items()}
+
+# Full-scale values used by API.read_accel to convert counts to g
+FULL_SCALE = {
+    2: 1.999,
+    4: 3.998,
+    8: 7.996,
+    16: 15.992
+}
+
+# Printed by MicroPython when the board restarts
+RESET_BANNER = 'soft reboot'
+
+# Output data rate in Hz for each API.odr key
+ODR_HZ = {
+    1: 0.781, 2: 1.563, 4: 3.125, 8: 6.25, 16: 12.5, 32: 25, 64: 50,
+    128: 100, 256: 200, 512: 400, 1024: 800, 2048: 1600
+}
+
+
+def encode_frame(codec: str, samples, seq: int) -> bytes:
+    """
+    Encode raw 12-bit (x, y, z) samples into one binary frame.
+
+    Host-side twin of API.encode_frame, used for benchmarks and simulated devices.
+
+    Parameters:
+        codec (str): 'pack' or 'delta'.
+        samples (list): Sequence of (x, y, z) signed 12-bit counts (at most 255).
+        seq (int): Sequence number of the first sample.
+
+    Returns:
+        bytes: The encoded frame including its header.
+    """
+    payload = bytearray()
+    delta = codec == 'delta'
+    acc = 0
+    nbits = 0
+    prev = None
+    for s in samples:
+        for i in range(3):
+            v = s[i]
+            if prev is None or not delta:
+                field, width = v & 0xFFF, 12
+            else:
+                d = v - prev[i]
+                if -8 <= d <= 7:
+                    field, width = d & 0xF, 5
+                elif -128 <= d <= 127:
+                    field, width = 0x200 | (d & 0xFF), 10
+                else:
+                    field, width = 0x3000 | (v & 0xFFF), 14
+            acc = (acc << width) | field
+            nbits += width
+            while nbits >= 8:
+                nbits -= 8
+                payload.append((acc >> nbits) & 0xFF)
+            acc &= (1 << nbits) - 1
+        prev = s
+    if nbits:
+        payload.append((acc << (8 - nbits)) & 0xFF)
+    header = FRAME_MAGIC + bytes([
+        CODEC_ID[codec], len(samples),
+        seq & 0xFF, (seq >> 8) & 0xFF,
+        len(payload) & 0xFF, len(payload) >> 8
+    ])
+    return header + bytes(payload)
+
+
+def decode_payload(codec: str, count: int, payload: bytes) -> list:
+    """
+    Decode the payload of a binary frame back into raw (x, y, z) counts.
+
+    Parameters:
+        codec (str): 'pack' or 'delta'.
+        count (int): Number of samples in the frame.
+        payload (bytes): Frame payload without the header.
+
+    Returns:
+        list: Decoded (x, y, z) tuples of signed 12-bit counts.
+    """
+    # Read the whole payload as one big integer and walk it from the MSB
+    bits = int.from_bytes(payload, 'big')
+    pos = len(payload) * 8
+    delta = codec == 'delta'
+    samples = []
+    prev = None
+    for _ in range(count):
+        sample = []
+        for i in range(3):
+            if prev is None or not delta:
+                pos -= 12
+                v = (bits >> pos) & 0xFFF
+                if v & 0x800:
+                    v -= 0x1000
+            else:
+                pos -= 1
+                if not (bits >> pos) & 1:
+                    pos -= 4
+                    d = (bits >> pos) & 0xF
+                    v = prev[i] + (d - 0x10 if d & 0x8 else d)
+                else:
+                    pos -= 1
+                    if not (bits >> pos) & 1:
+                        pos -= 8
+                        d = (bits >> pos) & 0xFF
+                        v = prev[i] + (d - 0x100 if d & 0x80 else d)
+                    else:
+                        pos -= 12
+                        v = (bits >> pos) & 0xFFF
+                        if v & 0x800:
+                            v -= 0x1000
+            sample.append(v)
+        prev = sample
+        samples.append(tuple(sample))
+    return samples
+
+
+def benchmark_codec(n: int = 32768, frame_len: int = 32) -> dict:
+    """
+    Measure bytes per sample and host encode/decode cost for every codec.
+
+    Uses a synthetic vibration signal with a few LSB of noise, close to what
+    a KXTJ3 at rest or under light vibration produces.
+
+    Returns:
+        dict: codec -> (bytes per sample, encode us/sample, decode us/sample).
+    """
+    import math
+    import random
+    rng = random.Random(0)
+    samples = []
+    for i in range(n):
+        w = math.sin(i * 0.05) * 40
+        samples.append((int(w + rng.gauss(0, 2)), int(-w + rng.gauss(0, 2)), int(1024 + rng.gauss(0, 2))))
+    t0 = time.perf_counter()
+    lines = [f'{x / 1024} {y / 1024} {z / 1024}\r\n' for x, y, z in samples]
+    t1 = time.perf_counter()
+    for line in lines:
+        tuple(map(float, line.split()))
+    t2 = time.perf_counter()
+    results = {'text': (sum(len(line) for line in lines) / n, (t1 - t0) / n * 1e6, (t2 - t1) / n * 1e6)}
+    for codec in ('pack', 'delta'):
+        frames = []
+        t0 = time.perf_counter()
+        for i in range(0, n, frame_len):
+            frames.append(encode_frame(codec, samples[i:i + frame_len], i))
+        t1 = time.perf_counter()
+        decoded = []
+        for frame in frames:
+            decoded.extend(decode_payload(codec, frame[3], frame[FRAME_HEADER_LEN:]))
+        t2 = time.perf_counter()
+        if decoded != samples:
+            raise Exception(f"Codec {codec} failed to round-trip.")
+        size = sum(len(f) for f in frames)
+        results[codec] = (size / n, (t1 - t0) / n * 1e6, (t2 - t1) / n * 1e6)
+    return results
+
+
+class SampleClock:
+    """
+    Assigns host timestamps to received samples.
+
+    Binary frames carry the sequence number of their first sample. The
+    device time advances by one period per sequence step at the rate in
+    force, and a sample at device time d is stamped t_anchor + (d - d_anchor).
+    Each read arrives with its own delay: the anchor follows an
+    earlier-than-expected arrival at once and a later one only slowly, which
+    keeps it near the lowest latency and tracks the drift between the device
+    and host clocks.
+    Timestamps never decrease. The text stream carries no sequence numbers,
+    so its samples are stamped with their read time.
+
+    The device paces its reads and numbers output data periods, so the
+    sequence count gives the sample time on the device clock. The anchor
+    corrections carry the drift of that clock against the arrivals, which
+    makes the host stamps the input of TimingMonitor: their rate and jitter
+    are measured on the host clock while the sequence numbers report drops
+    and duplicates.
+    """
+
+    def __init__(self, rate_hz: float, alpha: float = 0.01):
+        """
+        Initialize the SampleClock instance.
+
+        Parameters:
+            rate_hz (float): Output data rate in Hz.
+            alpha (float): Fraction of a late arrival applied to the anchor per read.
+        """
+        self.rate_hz = rate_hz
+        self.alpha = alpha
+        self.last_time = None
+        self.device_time = 0.0  # Device time of the last sequenced block's first sample
+        self.last_seq = None
+        self.anchor_device_time = 0.0
+        self.reset()
+
+    def reset(self):
+        """
+        Re-anchor on the next read, e.g. after the device restarted its sequence numbers.
+        The device time continues from the end of the last block.
+        """
+        self._close_block()
+        self.last_seq = None
+        self.anchor_time = None
+
+    def set_rate(self, rate_hz: float):
+        """
+        Change the rate after a live ODR switch. The device pauses for the
+        switch, so the next read re-anchors; the device time reached so far
+        keeps its value and only later periods take the new rate.
+        """
+        self._close_block()
+        self.rate_hz = rate_hz
+        self.anchor_time = None
+
+    def _close_block(self):
+        """
+        Advance the device time past the last block at the current rate, so
+        the next step starts from its end.
+        """
+        if self.last_seq is not None:
+            self.device_time += self.last_n / self.rate_hz
+            self.last_seq = (self.last_seq + self.last_n) % SEQ_MODULO
+        self.last_n = 0
+
+    def stamp(self, blocks, now: float) -> list:
+        """
+        Timestamp the blocks returned by one SerialComm.read_blocks call.
+
+        Parameters:
+            blocks (list): (seq, samples) tuples in stream order.
+            now (float): Time the blocks were read.
+
+        Returns:
+            list: (times, device_times) NumPy arrays per block: host timestamps,
+            and the sample times on the device clock (the unclamped read times
+            for the text stream).
+        """
+        period = 1.0 / self.rate_hz
+        starts = []
+        for seq, samples in blocks:
+            if seq is None:
+                starts.append(None)
+                continue
+            if self.last_seq is not None:
+                step = (seq - self.last_seq) % SEQ_MODULO
+                if step >= SEQ_MODULO // 2:
+                    # The sequence went backwards: continue the device time and start over
+                    step = self.last_n
+                    self.anchor_time = None
+                self.device_time += step * period
+            self.last_seq = seq
+            self.last_n = len(samples)
+            starts.append(self.device_time)
+
+        if any(start is not None for start in starts):
+            # Correct the anchor with the newest sample, which waited least for this read
+            end = self.device_time + (self.last_n - 1) * period
+            if self.anchor_time is None:
+                self.anchor_time, self.anchor_device_time = now, end
+            else:
+                err = now - (self.anchor_time + end - self.anchor_device_time)
+                self.anchor_time += err if err < 0 else self.alpha * err
+
+        stamped = []
+        for start, (seq, samples) in zip(starts, blocks):
+            n = len(samples)
+            if start is None:
+                device_times = now - (n - 1 - np.arange(n)) * period
+                times = device_times
+            else:
+                device_times = start + np.arange(n) * period
+                times = self.anchor_time + (device_times - self.anchor_device_time)
+            if self.last_time is not None:
+                times = np.maximum(times, self.last_time)
+            if n:
+                self.last_time = float(times[-1])
+            stamped.append((times, device_times))
+        return stamped
+
 
 class SerialComm:
     """
     Handles serial communication with the sensor device.
     """
 
-    def __init__(self, sensor_name: str, scale_range: int, odr: int, port: str, baudrate: int = 115200, timeout: float = 1):
+    def __init__(self, sensor_name: str, scale_range: int, odr: int, port: str, baudrate: int = 115200, timeout: float = 1,
+                 codec: str = 'delta', serial_factory=serial.Serial):
         """
         Initialize the SerialComm instance.
 
@@ -24,6 +317,10 @@ class SerialComm:
             port (str): Serial port to connect to.
             baudrate (int): Baud rate for the connection.
             timeout (float): Timeout for the serial connection.
+            codec (str): Preferred stream codec ('delta', 'pack' or 'text').
+                The codec actually used is negotiated in connect().
+            serial_factory (callable): Opens the port; called like serial.Serial.
+                Replaced by a simulated device in benchmarks.
         """
         self.sensor_name = sensor_name
         self.scale_range = scale_range
@@ -32,11 +329,27 @@ class SerialComm:
         self.baudrate = baudrate
         self.timeout = timeout
         self.ser = None
+        self.preferred_codec = codec
+        self.codec = 'text'
+        self.serial_factory = serial_factory
+        # Set when the device API accepts in-band 'cfg' commands
+        self.supports_live_config = False
+        # Incremented every time the device acknowledges a new configuration
+        self.config_version = 0
+        # Incremented when the board announces a reset in the stream
+        self.device_resets = 0
+        self._rx = bytearray()
 
-    def connect(self):
+    def connect(self, fast: bool = False):
         """
         Connect to the sensor via the serial port and initialize it using API commands.
 
+        Parameters:
+            fast (bool): Resume quickly after a reset or dropout: interrupt
+                whatever the board is running instead of waiting for it to go
+                quiet, and start streaming without the initial delay of
+                API.read_accel.
+
         Raises:
             Exception: If any error occurs during connection or initialization.
         """
@@ -44,57 +357,163 @@ class SerialComm:
         if self.sensor_name != 'kionix':
             raise Exception("Selected sensor is under development. Please select a different sensor type.")
 
+        # A failed fast resume only closes the port; the caller retries right away
+        abort = self.close if fast else self.disconnect
+
         try:
-            self.ser = serial.Serial(self.port, self.baudrate, timeout=self.timeout)
+            self.ser = self.serial_factory(self.port, self.baudrate, timeout=self.timeout)
             self.ser.reset_input_buffer()
 
-            # Read initial lines until an empty line is received
-            while True:
-                line = self.ser.readline().decode('utf-8').strip()
-                if line == '':
-                    break
+            if fast:
+                # Stop a running program (e.g. main.py after a reset) and drop its output
+                self.ser.write(b'\x03\x03')
+                time.sleep(0.02)
+                self.ser.reset_input_buffer()
+            else:
+                # Read initial lines until an empty line is received
+                while True:
+                    line = self.ser.readline().decode('utf-8').strip()
+                    if line == '':
+                        break
 
             # Send API import command
             self.ser.write(b'import API\r\n')
             line = self.ser.readline().decode('utf-8').strip()
             if 'import API' in line:
-                # Initialize sensor with scale_range and odr
-                cmd = f'API.init_sensor(API.acc_range[{self.scale_range}],API.odr[{self.odr}])\r\n'
-                self.ser.write(cmd.encode())
-                line = self.ser.readline().decode('utf-8').strip()
-                if line == f'>>> API.init_sensor(API.acc_range[{self.scale_range}],API.odr[{self.odr}])':
+                # Initialize sensor with scale_range and odr, unless a fast resume
+                # finds it still running with these settings
+                cmd = f'API.init_sensor(API.acc_range[{self.scale_range}],API.odr[{self.odr}])'
+                if fast and self._sensor_configured():
+                    line = f'>>> {cmd}'
+                else:
+                    self.ser.write(f'{cmd}\r\n'.encode())
+                    line = self.ser.readline().decode('utf-8').strip()
+                if line == f'>>> {cmd}':
                     # Check sensor identity
                     self.ser.write(b'API.check_who_am_i()\r\n')
                     line = self.ser.readline().decode('utf-8').strip()
                     if line == '>>> API.check_who_am_i()':
                         line = self.ser.readline().decode('utf-8').strip()
                         if line == 'True':
+                            # The codec is kept when resuming a device that was already negotiated
+                            if not (fast and self.supports_live_config):
+                                self.codec = self._negotiate_codec()
                             # Start reading acceleration data
-                            cmd = f'API.read_accel({self.scale_range})\r\n'
-                            self.ser.write(cmd.encode())
+                            if fast and self.supports_live_config:
+                                cmd = f"API.read_accel({self.scale_range},'{self.codec}',0)"
+                            elif self.codec == 'text':
+                                cmd = f'API.read_accel({self.scale_range})'
+                            else:
+                                cmd = f"API.read_accel({self.scale_range},'{self.codec}')"
+                            self.ser.write(f'{cmd}\r\n'.encode())
                             line = self.ser.readline().decode('utf-8').strip()
-                            if line == f'>>> API.read_accel({self.scale_range})':
+                            if line == f'>>> {cmd}':
+                                self._rx.clear()
                                 return  # Successful connection and initialization
                             else:
-                                self.disconnect()
+                                abort()
                                 raise Exception("Error in API.read_accel command.")
                         else:
-                            self.disconnect()
+                            abort()
                             raise Exception("Sensor identification failed.")
                     else:
-                        self.disconnect()
+                        abort()
                         raise Exception("Error in API.check_who_am_i command.")
                 else:
-                    self.disconnect()
+                    abort()
                     raise Exception("Error in API.init_sensor command.")
             else:
-                self.disconnect()
+                abort()
                 raise Exception("Error importing API.")
         except serial.SerialException as e:
             raise Exception(f"Serial connection error: {e}")
         except Exception as e:
             raise Exception(f"Unexpected error: {e}")
 
+    def _sensor_configured(self) -> bool:
+        """
+        Ask the device whether the sensor still runs with the current range and ODR.
+
+        Returns:
+            bool: True if init_sensor can be skipped. False on older device APIs.
+        """
+        if not self.supports_live_config:
+            return False
+        cmd = f'API.is_configured(API.acc_range[{self.scale_range}],API.odr[{self.odr}])'
+        self.ser.write(f'{cmd}\r\n'.encode())
+        line = self.ser.readline().decode('utf-8').strip()
+        if line != f'>>> {cmd}':
+            raise Exception("Error in API.is_configured command.")
+        return self.ser.readline().decode('utf-8').strip() == 'True'
+
+    def _negotiate_codec(self) -> str:
+        """
+        Ask the device for its stream codecs and pick the preferred common one.
+
+        Devices running an older API without codec support answer with a
+        traceback, in which case the text stream is used and live
+        reconfiguration stays disabled.
+
+        Returns:
+            str: The codec to request from API.read_accel.
+        """
+        self.supports_live_config = False
+        self.ser.write(b'API.codecs()\r\n')
+        line = self.ser.readline().decode('utf-8').strip()
+        if line != '>>> API.codecs()':
+            raise Exception("Error in API.codecs command.")
+        # Either the codec list or a traceback ending in an error line
+        for _ in range(4):
+            line = self.ser.readline().decode('utf-8').strip()
+            if not line or 'Error' in line:
+                return 'text'
+            if not line.startswith('Traceback') and not line.startswith('File'):
+                # Devices that report codecs also accept in-band configuration
+                self.supports_live_config = True
+                supported = line.strip("'").split()
+                if self.preferred_codec in supported:
+                    return self.preferred_codec
+                for codec in ('delta', 'pack'):
+                    if codec in supported:
+                        return codec
+                return 'text'
+        return 'text'
+
+    def reconfigure(self, scale_range: int, odr: int):
+        """
+        Ask the streaming device to switch range and ODR without reconnecting.
+
+        The change takes effect when the device acknowledges it; read_blocks()
+        then updates scale_range, odr and config_version.
+
+        Parameters:
+            scale_range (int): New sensor scale range.
+            odr (int): New Data Output Rate (converted value).
+
+        Raises:
+            Exception: If the device does not support live configuration.
+        """
+        if not self.ser or not self.supports_live_config:
+            raise Exception("Live reconfiguration is not supported by the connected device.")
+        self.ser.write(f'cfg {scale_range} {odr}\n'.encode())
+
+    def _apply_config_ack(self, message: str) -> bool:
+        """
+        Apply a 'cfg <range> <odr>' acknowledgement from the device.
+
+        Returns:
+            bool: True if the message was a valid acknowledgement.
+        """
+        parts = message.split()
+        if len(parts) != 3 or parts[0] != 'cfg':
+            return False
+        try:
+            self.scale_range, self.odr = int(parts[1]), int(parts[2])
+        except ValueError:
+            return False
+        self.config_version += 1
+        return True
+
     def disconnect(self):
         """
         Disconnect from the sensor and close the serial port.
@@ -112,6 +531,18 @@ class SerialComm:
             finally:
                 self.ser = None
 
+    def close(self):
+        """
+        Close the serial port without resetting the board, e.g. after the link dropped.
+        """
+        if self.ser:
+            try:
+                self.ser.close()
+            except Exception:
+                pass
+            finally:
+                self.ser = None
+
     def read_line(self) -> str:
         """
         Read a line of data from the serial port.
@@ -125,3 +556,79 @@ class SerialComm:
             except Exception as e:
                 raise Exception(f"Error reading data: {e}")
         return ""
+
+    def read_blocks(self) -> list:
+        """
+        Read all available samples, whichever codec is in use.
+
+        Returns:
+            list: (seq, samples) tuples, where samples is a list of (x, y, z)
+            values in g and seq is the sequence number of the first sample
+            (None for the text stream, which carries no sequence numbers).
+
+        Reading stops right after a configuration acknowledgement, so every
+        returned sample was measured with the configuration that was current
+        before the call; compare config_version to detect the switch.
+        """
+        if self.codec == 'text':
+            line = self.read_line()
+            if line.startswith('#'):
+                self._apply_config_ack(line[1:])
+                return []
+            if RESET_BANNER in line:
+                self.device_resets += 1
+                return []
+            values = line.split()
+            if len(values) == 3:
+                try:
+                    return [(None, [tuple(map(float, values))])]
+                except ValueError:
+                    pass
+            return []
+
+        if self.ser and self.ser.in_waiting:
+            try:
+                data = self.ser.read(self.ser.in_waiting)
+            except Exception as e:
+                raise Exception(f"Error reading data: {e}")
+            if RESET_BANNER.encode() in data:
+                self.device_resets += 1
+            self._rx += data
+        sensitivity = FULL_SCALE.get(self.scale_range, self.scale_range) / 2048
+        blocks = []
+        rx = self._rx
+        while True:
+            start = rx.find(FRAME_MAGIC)
+            if start < 0:
+                # Keep a possible partial magic at the end of the buffer
+                del rx[:max(0, len(rx) - 1)]
+                break
+            if len(rx) - start < FRAME_HEADER_LEN:
+                del rx[:start]
+                break
+            codec = CODEC_NAME.get(rx[start + 2])
+            count = rx[start + 3]
+            seq = rx[start + 4] | (rx[start + 5] << 8)
+            length = rx[start + 6] | (rx[start + 7] << 8)
+            end = start + FRAME_HEADER_LEN + length
+            if codec is None or (codec != 'control' and length > count * 6 + 1):
+                # Not a real frame header, resynchronise after the magic
+                del rx[:start + 1]
+                continue
+            if len(rx) < end:
+                del rx[:start]
+                break
+            payload = bytes(rx[start + FRAME_HEADER_LEN:end])
+            del rx[:end]
+            if codec == 'control':
+                if self._apply_config_ack(payload.decode('utf-8', 'replace')):
+                    break
+                continue
+            counts = decode_payload(codec, count, payload)
+            blocks.append((seq, [(x * sensitivity, y * sensitivity, z * sensitivity) for x, y, z in counts]))
+        return blocks
+
+
+if __name__ == '__main__':
+    for name, (size, enc, dec) in benchmark_codec().items():
+        print(f'{name:>6}: {size:6.2f} bytes/sample, encode {enc:6.2f} us/sample, decode {dec:6.2f} us/sample')
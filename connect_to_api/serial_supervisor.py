@@ -0,0 +1,211 @@
+"""
+serial_supervisor.py
+
+This module provides the SerialSupervisor class which keeps a SerialComm
+stream alive during unattended runs. A data-rate watchdog detects stalls,
+read errors close the port, and the connection is restored with the fast
+handshake of SerialComm.connect, retrying with exponential backoff. Every
+interruption is reported as a gap so recordings can mark it and continue.
+Running the module measures reconnect downtime against FakeLink dropouts.
+"""
+
+import threading
+import time
+
+from serial_comm import SerialComm, ODR_HZ
+
+
+class SerialSupervisor:
+    """
+    Wraps a SerialComm, reconnecting it whenever the stream stops.
+
+    Attributes other than the ones defined here (codec, scale_range, odr,
+    config_version, ser, ...) are read from the wrapped SerialComm, so the
+    supervisor can be used in its place.
+    """
+
+    def __init__(self, comm: SerialComm, min_stall: float = 0.2, stall_reads: int = 3, grace: float = 1.5,
+                 backoff_start: float = 0.05, backoff_max: float = 2.0):
+        """
+        Initialize the SerialSupervisor instance.
+
+        Parameters:
+            comm (SerialComm): The connection to supervise.
+            min_stall (float): Shortest time without data, in seconds, that counts as a stall.
+            stall_reads (int): A stall is also at least this many frame periods
+                (sample periods for the text stream), so slow ODRs are not flagged.
+            grace (float): Extra time allowed after a live reconfiguration, while
+                the device re-initializes the sensor.
+            backoff_start (float): Delay after the first failed reconnect attempt.
+            backoff_max (float): Upper limit of the reconnect delay.
+        """
+        self.comm = comm
+        self.min_stall = min_stall
+        self.stall_reads = stall_reads
+        self.grace = grace
+        self.backoff_start = backoff_start
+        self.backoff_max = backoff_max
+        self.reconnects = 0  # Successful reconnections
+        self.failed_attempts = 0  # Reconnect attempts that failed
+        self.last_data = None  # Time the last block arrived
+        self._quiet_until = 0.0  # No stall is reported before this time
+        self._starting = False  # Set until the first data after (re)connecting
+        self._gap = None  # Gap being recovered: start, reason, attempts
+        self._gaps = []  # Finished gaps not yet collected with pop_gaps
+        self._resets = 0  # comm.device_resets when the stream was last started
+        self._stop = threading.Event()
+        self._lock = threading.Lock()  # Serializes reconnect attempts with disconnect
+
+    def __getattr__(self, name):
+        return getattr(self.comm, name)
+
+    def connect(self):
+        """
+        Connect with the full handshake and start watching the stream.
+        """
+        self._stop.clear()
+        self.comm.connect()
+        self._resets = self.comm.device_resets
+        now = time.time()
+        self.last_data = now
+        # API.read_accel waits before the first sample
+        self._quiet_until = now + 2.0 + self.grace
+        self._starting = True
+
+    def disconnect(self):
+        """
+        Stop supervising and disconnect, interrupting a reconnect in progress.
+        """
+        self._stop.set()
+        with self._lock:
+            self.comm.disconnect()
+
+    def reconfigure(self, scale_range: int, odr: int):
+        """
+        Forward a live range/ODR switch, allowing for the pause it causes.
+        """
+        self.comm.reconfigure(scale_range, odr)
+        self._quiet_until = time.time() + self.grace
+
+    def stall_timeout(self) -> float:
+        """
+        Return the time without data after which the stream counts as stalled.
+
+        Binary frames carry up to 32 samples, so the stream is bursty at low ODRs.
+        """
+        samples_per_read = 1 if self.comm.codec == 'text' else 32
+        return max(self.min_stall, self.stall_reads * samples_per_read / ODR_HZ.get(self.comm.odr, 1.0))
+
+    def read_blocks(self) -> list:
+        """
+        Read decoded blocks like SerialComm.read_blocks, recovering from dropouts.
+
+        Blocks until the connection is restored or disconnect() is called.
+
+        Returns:
+            list: (seq, samples) tuples, empty if nothing arrived.
+        """
+        try:
+            blocks = self.comm.read_blocks()
+        except Exception as e:
+            reason = f'error: {e}'
+        else:
+            now = time.time()
+            if blocks:
+                if self._gap is not None:
+                    # The first data after a reconnect closes the gap
+                    self._gaps.append(dict(self._gap, end=now))
+                    self._gap = None
+                if self._starting:
+                    # The stream is up, watch it at the normal stall timeout
+                    self._quiet_until = now
+                    self._starting = False
+                self.last_data = now
+                return blocks
+            if self.comm.device_resets != self._resets:
+                # The board restarted and may be running main.py instead of the API stream
+                reason = 'reset'
+            elif now - self.last_data < self.stall_timeout() or now < self._quiet_until:
+                return []
+            else:
+                reason = 'stall'
+        self._recover(reason)
+        return []
+
+    def _recover(self, reason: str):
+        """
+        Close the port and reconnect with backoff until it succeeds or disconnect() is called.
+        """
+        if self._gap is None:
+            self._gap = {'start': self.last_data, 'reason': reason, 'attempts': 0}
+        self.comm.close()
+        delay = self.backoff_start
+        while not self._stop.is_set():
+            with self._lock:
+                if self._stop.is_set():
+                    return
+                self._gap['attempts'] += 1
+                try:
+                    self.comm.connect(fast=True)
+                except Exception:
+                    self.comm.close()
+                    self.failed_attempts += 1
+                else:
+                    self.reconnects += 1
+                    self._resets = self.comm.device_resets
+                    now = time.time()
+                    self.last_data = now
+                    # The sensor may still be starting up after init_sensor
+                    self._quiet_until = now + self.grace
+                    self._starting = True
+                    return
+            self._stop.wait(delay)
+            delay = min(delay * 2, self.backoff_max)
+
+    def pop_gaps(self) -> list:
+        """
+        Return the gaps closed since the last call.
+
+        Returns:
+            list: Dictionaries with 'start' (time of the last data before the
+            dropout), 'end' (time of the first data after it), 'reason' and
+            'attempts'.
+        """
+        gaps, self._gaps = self._gaps, []
+        return gaps
+
+
+def measure_reconnect(mode: str = 'unplug', codec: str = 'delta', duration: float = 8.0, period: float = 2.0,
+                      down_time: float = 0.05, init_delay: float = None) -> list:
+    """
+    Stream from a FakeLink that drops out every period seconds and time each gap.
+
+    Returns:
+        list: Downtime in seconds of every dropout, from the last sample before
+        it to the first sample after it.
+    """
+    from fake_device import FakeLink
+
+    link = FakeLink(period, down_time, mode, init_delay=init_delay, start_delay=0.2)
+    comm = SerialComm('kionix', 2, 2048, 'fake', timeout=0.05, codec=codec, serial_factory=link)
+    supervisor = SerialSupervisor(comm)
+    supervisor.connect()
+    end = time.time() + duration
+    downtimes = []
+    while time.time() < end:
+        if not supervisor.read_blocks():
+            time.sleep(0.001)
+        downtimes.extend(g['end'] - g['start'] for g in supervisor.pop_gaps())
+    supervisor.disconnect()
+    return downtimes
+
+
+if __name__ == '__main__':
+    for mode in ('unplug', 'reset', 'hang'):
+        for codec in ('text', 'delta'):
+            downtimes = measure_reconnect(mode, codec)
+            if downtimes:
+                print(f'{mode:>6} {codec:>5}: {len(downtimes)} dropouts, downtime mean '
+                      f'{sum(downtimes) / len(downtimes) * 1000:6.1f} ms, max {max(downtimes) * 1000:6.1f} ms')
+            else:
+                print(f'{mode:>6} {codec:>5}: no dropouts recovered')
@@ -0,0 +1,397 @@
+"""
+stream_align.py
+
+This module provides the StreamAligner class which merges the streams of
+several devices onto one common time base. Each device has its own clock,
+so the host-read timestamps of every stream are fitted to a clock model
+(exponentially weighted least squares of time against sample index), which
+removes read jitter and follows rate errors of the device oscillator. Each
+stream is then resampled at the common output grid, either linearly or with
+a polyphase windowed-sinc interpolator, using NumPy over whole blocks.
+Output lags the newest data by a bounded time and every stream keeps only
+the samples still needed, so memory stays constant. Running the module
+validates the alignment on synthetic streams with known offsets and
+benchmarks 16 devices at 1600 Hz.
+"""
+
+import math
+import time
+
+import numpy as np
+
+
+def polyphase_table(taps: int, phases: int, cutoff: float) -> np.ndarray:
+    """
+    Design a windowed-sinc fractional-delay filter bank.
+
+    Parameters:
+        taps (int): Taps per phase (even).
+        phases (int): Number of fractional positions between two input samples.
+        cutoff (float): Cutoff in cycles per input sample (0.5 is the Nyquist rate).
+
+    Returns:
+        ndarray: (phases, taps) coefficients, each phase normalized to unit DC gain.
+            Phase p, tap k weights input sample i0 - taps/2 + 1 + k for the
+            position i0 + p/phases.
+    """
+    k = np.arange(taps) - taps // 2 + 1
+    frac = np.arange(phases)[:, None] / phases
+    x = k[None, :] - frac
+    window = np.cos(np.pi * x / (taps + 1)) ** 2  # Hann window centred on the position
+    table = 2 * cutoff * np.sinc(2 * cutoff * x) * window
+    return table / table.sum(axis=1, keepdims=True)
+
+
+class _Stream:
+    """
+    Buffered samples and clock model of one device stream.
+    """
+
+    def __init__(self, name: str, rate_hz: float, offset_s: float, channels: int, tau_s: float,
+                 gap_s: float, max_samples: int):
+        self.name = name
+        self.rate_hz = rate_hz
+        self.offset_s = offset_s
+        self.channels = channels
+        self.decay = math.exp(-1.0 / (tau_s * rate_hz))
+        self.gap_s = gap_s
+        self.max_samples = max_samples
+        self.period = 1.0 / rate_hz
+        # Ridge weight pulling the fitted period towards the nominal one: the
+        # index variance of half a second of samples
+        self.prior = (0.5 * rate_hz) ** 2 * 0.5 * rate_hz / 12
+        self.segments = 0
+        self.reset()
+
+    def reset(self):
+        """Start a new segment, e.g. after a dropout: forget samples and clock model."""
+        self.values = np.empty((0, self.channels))
+        self.first_index = 0  # Sample index of values[0]
+        self.count = 0  # Index of the next sample
+        self.t_base = None
+        self.weight = 0.0
+        self.mean_i = 0.0
+        self.mean_t = 0.0
+        self.cov = 0.0
+        self.var = 0.0
+        self.slope = self.period
+        self.segments += 1
+
+    def time_at(self, index):
+        """Return the fitted time of a sample index."""
+        return self.t_base + self.mean_t + self.slope * (index - self.mean_i)
+
+    def position(self, times):
+        """Return the fractional sample index at the given times."""
+        return self.mean_i + (times - self.t_base - self.mean_t) / self.slope
+
+    def push(self, times, values):
+        times = np.asarray(times, dtype=np.float64) - self.offset_s
+        values = np.asarray(values, dtype=np.float64).reshape(-1, self.channels)
+        n = len(times)
+        if n == 0:
+            return
+        if self.count and abs(times[0] - self.time_at(self.count)) > self.gap_s:
+            self.reset()
+        if self.t_base is None:
+            self.t_base = float(times[0])
+        index = self.count + np.arange(n, dtype=np.float64)
+        t = times - self.t_base
+
+        # Exponentially weighted merge of the block into the running moments
+        w = self.decay ** np.arange(n - 1, -1, -1, dtype=np.float64)
+        w_b = w.sum()
+        mi_b = (w * index).sum() / w_b
+        mt_b = (w * t).sum() / w_b
+        cov_b = (w * (index - mi_b) * (t - mt_b)).sum()
+        var_b = (w * (index - mi_b) ** 2).sum()
+        fade = self.decay ** n
+        w_a = self.weight * fade
+        total = w_a + w_b
+        di = mi_b - self.mean_i
+        dt = mt_b - self.mean_t
+        self.mean_i += di * w_b / total
+        self.mean_t += dt * w_b / total
+        self.cov = self.cov * fade + cov_b + di * dt * w_a * w_b / total
+        self.var = self.var * fade + var_b + di * di * w_a * w_b / total
+        self.weight = total
+        slope = (self.cov + self.prior * self.period) / (self.var + self.prior)
+        self.slope = min(max(slope, 0.98 * self.period), 1.02 * self.period)
+
+        self.values = np.concatenate((self.values, values))
+        self.count += n
+        if len(self.values) > self.max_samples:
+            drop = len(self.values) - self.max_samples
+            self.values = self.values[drop:]
+            self.first_index += drop
+
+    def trim(self, index: int):
+        """Forget the samples before index."""
+        drop = min(max(0, index - self.first_index), len(self.values))
+        if drop:
+            self.values = self.values[drop:]
+            self.first_index += drop
+
+
+class StreamAligner:
+    """
+    Aligns several device streams onto a common output sample grid.
+    """
+
+    def __init__(self, rate_hz: float, method: str = 'linear', max_latency: float = 0.25, tau_s: float = 10.0,
+                 gap_s: float = 0.1, taps: int = 16, phases: int = 64):
+        """
+        Initialize the StreamAligner instance.
+
+        Parameters:
+            rate_hz (float): Output sample rate in Hz.
+            method (str): 'linear' or 'polyphase' resampling.
+            max_latency (float): Output never lags the newest data by more than this
+                many seconds; streams that are late by then get NaN for those samples.
+            tau_s (float): Time constant of the clock models in seconds.
+            gap_s (float): Timestamp jump that starts a new segment of a stream.
+            taps (int): Taps per phase of the polyphase interpolator.
+            phases (int): Phases of the polyphase interpolator.
+        """
+        if method not in ('linear', 'polyphase'):
+            raise ValueError(f"Unknown resampling method: {method}")
+        self.rate_hz = rate_hz
+        self.method = method
+        self.max_latency = max_latency
+        self.tau_s = tau_s
+        self.gap_s = gap_s
+        self.taps = taps
+        self.phases = phases
+        self.streams = []
+        self.tables = []
+        self.next_k = None  # Grid index of the next output sample
+
+    def add_stream(self, name: str, rate_hz: float, offset_s: float = 0.0, channels: int = 3) -> int:
+        """
+        Add a device stream.
+
+        Parameters:
+            name (str): Name used for the output channels.
+            rate_hz (float): Nominal output data rate of the device.
+            offset_s (float): Known delay of the stream's timestamps (e.g. transport
+                latency), subtracted from every timestamp.
+            channels (int): Values per sample.
+
+        Returns:
+            int: Stream id for push().
+        """
+        max_samples = int((self.max_latency * 4 + 1) * rate_hz) + 2 * self.taps
+        self.streams.append(_Stream(name, rate_hz, offset_s, channels, self.tau_s, self.gap_s, max_samples))
+        cutoff = 0.45 * min(1.0, self.rate_hz / rate_hz)
+        self.tables.append(polyphase_table(self.taps, self.phases, cutoff) if self.method == 'polyphase' else None)
+        return len(self.streams) - 1
+
+    def channel_names(self) -> list:
+        """Return the names of the merged output columns."""
+        names = []
+        for s in self.streams:
+            names.extend(f'{s.name}_{c}' for c in ('xyz' if s.channels == 3 else range(s.channels)))
+        return names
+
+    def push(self, stream_id: int, times, values):
+        """
+        Add a block of timestamped samples of one stream.
+
+        Parameters:
+            stream_id (int): Id returned by add_stream.
+            times (array-like): Host timestamps of the samples in seconds.
+            values (array-like): Samples of shape (n, channels).
+        """
+        self.streams[stream_id].push(times, values)
+
+    def _margin(self) -> int:
+        """Samples needed after an output position before it can be interpolated."""
+        return self.taps // 2 if self.method == 'polyphase' else 1
+
+    def pull(self, now: float = None) -> tuple:
+        """
+        Return the merged samples of every output time that is ready.
+
+        Output advances to the oldest time all streams with data can
+        interpolate. If now (host time) is given, it also advances to
+        now - max_latency, filling late streams with NaN.
+
+        Returns:
+            tuple: (times, values): output times of shape (m,) and merged
+            samples of shape (m, total channels) in channel_names() order.
+        """
+        margin = self._margin()
+        active = [s for s in self.streams if s.count > margin]
+        width = sum(s.channels for s in self.streams)
+        if not active:
+            return np.empty(0), np.empty((0, width))
+        ready = [float(s.time_at(s.count - 1 - margin)) for s in active]
+        limit = min(ready)
+        if now is not None:
+            limit = min(max(limit, now - self.max_latency), max(ready))
+        if self.next_k is None:
+            self.next_k = math.ceil(min(float(s.time_at(s.first_index + margin)) for s in active) * self.rate_hz)
+        last_k = math.floor(limit * self.rate_hz)
+        if last_k < self.next_k:
+            return np.empty(0), np.empty((0, width))
+        k = np.arange(self.next_k, last_k + 1)
+        times = k / self.rate_hz
+        self.next_k = last_k + 1
+
+        out = np.full((len(k), width), np.nan)
+        col = 0
+        for s, table in zip(self.streams, self.tables):
+            if s.count:
+                self._resample(s, table, times, out[:, col:col + s.channels])
+                # Keep the samples the next output times may still need
+                s.trim(int(math.floor(s.position(self.next_k / self.rate_hz))) - self.taps)
+            col += s.channels
+        return times, out
+
+    def _resample(self, s: _Stream, table, times, out):
+        """Interpolate stream s at the given times into out, leaving NaN where it has no data."""
+        pos = s.position(times) - s.first_index
+        i0 = np.floor(pos).astype(np.int64)
+        frac = pos - i0
+        n = len(s.values)
+        if table is None:
+            valid = (i0 >= 0) & (i0 + 1 < n)
+            if not valid.any():
+                return
+            i0, frac = i0[valid], frac[valid, None]
+            out[valid] = s.values[i0] * (1 - frac) + s.values[i0 + 1] * frac
+            return
+        phase = np.rint(frac * self.phases).astype(np.int64)
+        i0 += phase // self.phases
+        phase %= self.phases
+        first = i0 - self.taps // 2 + 1
+        valid = (first >= 0) & (first + self.taps <= n)
+        if not valid.any():
+            return
+        idx = first[valid, None] + np.arange(self.taps)
+        out[valid] = np.einsum('mk,mkc->mc', table[phase[valid]], s.values[idx])
+
+
+def synthesize(devices: int = 4, rate_hz: float = 1600.0, seconds: float = 10.0, frame_len: int = 32,
+               read_jitter: float = 0.002, seed: int = 0) -> list:
+    """
+    Simulate devices mounted on the same vibrating body, read by the host in frames.
+
+    Every device samples the same signal on its own clock (start offset and a
+    rate error of up to 100 ppm). The host reads each frame after a per-device
+    latency plus up to read_jitter seconds of random delay and stamps the
+    samples from their sequence numbers with a SampleClock, as
+    SensorApp.queue_blocks does.
+
+    Returns:
+        list: Per device: dict with 'times' (host timestamps), 'true_times',
+        'values' (n, 3) and 'latency' (the known offset of its timestamps).
+    """
+    from serial_comm import SampleClock
+
+    rng = np.random.default_rng(seed)
+    streams = []
+    for d in range(devices):
+        ppm = rng.uniform(-100, 100)
+        start = rng.uniform(0, 0.05)
+        latency = rng.uniform(0.001, 0.02)
+        n = int(seconds * rate_hz)
+        true_times = start + np.arange(n) / (rate_hz * (1 + ppm * 1e-6))
+        clock = SampleClock(rate_hz)
+        host = np.empty(n)
+        for i in range(0, n, frame_len):
+            j = min(i + frame_len, n)
+            read = true_times[j - 1] + latency + rng.uniform(0, read_jitter)
+            host[i:j] = clock.stamp([(i & 0xFFFF, range(i, j))], read)[0][0]
+        streams.append({'times': host, 'true_times': true_times, 'values': signal(true_times), 'latency': latency})
+    return streams
+
+
+def signal(t) -> np.ndarray:
+    """Common test vibration: 23 Hz on X, 61 Hz on Y, 1 g plus 7 Hz on Z."""
+    t = np.asarray(t, dtype=np.float64)
+    return np.column_stack((np.sin(2 * np.pi * 23 * t),
+                            0.5 * np.sin(2 * np.pi * 61 * t + 0.3),
+                            1 + 0.2 * np.sin(2 * np.pi * 7 * t)))
+
+
+def validate(method: str = 'linear', devices: int = 4, rate_hz: float = 1600.0, frame_len: int = 32,
+             read_jitter: float = 0.002, use_offsets: bool = True) -> dict:
+    """
+    Align synthetic streams and measure how far the merged channels are from the true signal.
+
+    The first two seconds are skipped while the clock models settle.
+
+    Returns:
+        dict: 'skew_us': largest difference between the streams' mean timing
+        errors, 'jitter_us': largest standard deviation of a stream's timing
+        error, 'rms_error': RMS difference between every merged channel and
+        the true signal at the output times (shifted by the mean timing
+        error common to all streams), 'nan_fraction': share of missing values.
+    """
+    data = synthesize(devices, rate_hz, frame_len=frame_len, read_jitter=read_jitter)
+    aligner = StreamAligner(rate_hz, method)
+    for d, stream in enumerate(data):
+        aligner.add_stream(f'dev{d}', rate_hz, stream['latency'] if use_offsets else 0.0)
+    timing_errors = [[] for _ in data]
+    out_times, out_values = [], []
+    n = len(data[0]['times'])
+    for i in range(0, n, frame_len):
+        for d, stream in enumerate(data):
+            aligner.push(d, stream['times'][i:i + frame_len], stream['values'][i:i + frame_len])
+            s = aligner.streams[d]
+            idx = np.arange(s.count - len(stream['times'][i:i + frame_len]), s.count)
+            timing_errors[d].append(s.time_at(idx) - stream['true_times'][i:i + frame_len])
+        t, v = aligner.pull()
+        out_times.append(t)
+        out_values.append(v)
+    times = np.concatenate(out_times)
+    values = np.concatenate(out_values)
+    settle = int(2 * rate_hz / frame_len)
+    means = [np.concatenate(e[settle:]).mean() for e in timing_errors]
+    jitter = max(np.concatenate(e[settle:]).std() for e in timing_errors)
+    bias = float(np.mean(means))
+    keep = times >= times[0] + 2.0
+    truth = np.tile(signal(times[keep] - bias), devices)
+    err = values[keep] - truth
+    return {
+        'skew_us': (max(means) - min(means)) * 1e6,
+        'jitter_us': jitter * 1e6,
+        'rms_error': float(np.sqrt(np.nanmean(err ** 2))),
+        'nan_fraction': float(np.isnan(values[keep]).mean())
+    }
+
+
+def benchmark(method: str = 'linear', devices: int = 16, rate_hz: float = 1600.0, seconds: float = 10.0,
+              frame_len: int = 32) -> float:
+    """
+    Measure the CPU time of aligning many devices, pulling after every round of frames.
+
+    Returns:
+        float: Real-time factor (seconds of data per second of CPU time).
+    """
+    n = int(seconds * rate_hz)
+    rng = np.random.default_rng(0)
+    times = np.arange(n) / rate_hz
+    values = rng.normal(size=(n, 3))
+    aligner = StreamAligner(rate_hz, method)
+    for d in range(devices):
+        aligner.add_stream(f'dev{d}', rate_hz)
+    offsets = rng.uniform(0, 0.01, devices)
+    t0 = time.process_time()
+    for i in range(0, n, frame_len):
+        for d in range(devices):
+            aligner.push(d, times[i:i + frame_len] + offsets[d], values[i:i + frame_len])
+        aligner.pull()
+    return seconds / (time.process_time() - t0)
+
+
+if __name__ == '__main__':
+    cases = (('no offsets', 0.002, False), ('known offsets', 0.002, True), ('no read jitter', 0.0, True))
+    for method in ('linear', 'polyphase'):
+        for label, read_jitter, use_offsets in cases:
+            r = validate(method, read_jitter=read_jitter, use_offsets=use_offsets)
+            print(f"{method:>9}, {label:>14}: skew {r['skew_us']:8.1f} us, jitter {r['jitter_us']:6.1f} us, "
+                  f"RMS error {r['rms_error']:.5f}, NaN {r['nan_fraction']:.4f}")
+    for method in ('linear', 'polyphase'):
+        print(f'{method:>9}: 16 devices at 1600 Hz run {benchmark(method):.1f}x real time on one core')
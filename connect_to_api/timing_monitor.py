@@ -0,0 +1,249 @@
+"""
+timing_monitor.py
+
+This module provides the TimingMonitor class which tracks the sample timing
+quality of one device stream: effective rate against the configured ODR,
+an inter-sample interval histogram, gaps, bursts, dropped or duplicated
+frames detected from sequence numbers, and repeated sample values. Rate
+and jitter are measured on host timestamps: for the binary streams those
+of SampleClock, whose anchor follows the arrivals against the sequence
+count, for the text stream the read time of each line. A reconnect or an
+ODR switch starts a new segment, and durations and rates add up the
+segments. Memory use is constant and every update processes a whole block
+of timestamps with NumPy.
+"""
+
+import numpy as np
+
+# Histogram bin edges for inter-sample intervals, in units of the nominal sample period
+INTERVAL_EDGES = np.array([0, 0.25, 0.5, 0.75, 0.9, 1.1, 1.25, 1.5, 2, 3, 5, 10, np.inf])
+
+# Sequence numbers in binary frames are 16-bit and wrap around
+SEQ_MODULO = 1 << 16
+
+
+class TimingMonitor:
+    """
+    Streaming sample-timing statistics for a single device.
+    """
+
+    def __init__(self, rate_hz: float, gap_factor: float = 1.5, burst_factor: float = 0.5, rate_alpha: float = 0.1):
+        """
+        Initialize the TimingMonitor instance.
+
+        Parameters:
+            rate_hz (float): Configured output data rate in Hz.
+            gap_factor (float): Intervals longer than this many periods count as gaps.
+            burst_factor (float): Intervals shorter than this many periods count as bursts.
+            rate_alpha (float): Smoothing factor of the recent-rate estimate.
+        """
+        self.gap_factor = gap_factor
+        self.burst_factor = burst_factor
+        self.rate_alpha = rate_alpha
+        self.rate_hz = rate_hz
+        self.reset()
+
+    def reset(self):
+        """
+        Clear all statistics, keeping the configuration.
+        """
+        self.samples = 0
+        self.segment_start = None  # First timestamp of the current segment
+        self.segment_samples = 0
+        self.last_time = None
+        self.closed_span = 0.0  # Duration, sample intervals and expected intervals of finished segments
+        self.closed_intervals = 0
+        self.closed_expected = 0.0
+        self.histogram = np.zeros(len(INTERVAL_EDGES) - 1, dtype=np.int64)
+        self.intervals = 0
+        self.interval_mean = 0.0
+        self.interval_m2 = 0.0
+        self.gaps = 0
+        self.gap_time = 0.0
+        self.missing_samples = 0
+        self.bursts = 0
+        self.dropped = 0
+        self.duplicated = 0
+        self.repeated = 0
+        self.last_sample = None
+        self.next_seq = None
+        self.recent_rate = None
+
+    def set_rate(self, rate_hz: float):
+        """
+        Change the configured rate after a live ODR switch.
+
+        The histogram is kept since it is expressed in sample periods. The
+        interval just after the switch is not attributed to either rate, and
+        the samples at the new rate start a new segment.
+        """
+        self._close_segment()
+        self.rate_hz = rate_hz
+        self.last_sample = None
+        self.recent_rate = None
+
+    def reset_sequence(self):
+        """
+        Forget the expected sequence number after the device restarted its stream.
+
+        The interval across the restart is not counted and a new segment
+        starts; the dropout itself is reported by the supervisor.
+        """
+        self._close_segment()
+        self.next_seq = None
+        self.last_sample = None
+
+    def update(self, times, seq: int = None, samples=None):
+        """
+        Add one block of sample timestamps.
+
+        Parameters:
+            times (array-like): Timestamps of the block's samples in seconds, in order.
+            seq (int): Sequence number of the block's first sample, or None if
+                the stream carries no sequence numbers.
+            samples (array-like): The block's (x, y, z) values, to count samples
+                repeating the previous value, or None.
+        """
+        times = np.asarray(times, dtype=np.float64)
+        n = len(times)
+        if n == 0:
+            return
+
+        if samples is not None:
+            values = np.asarray(samples, dtype=np.float64)
+            if self.last_sample is not None:
+                values = np.vstack((self.last_sample, values))
+            self.repeated += int((values[1:] == values[:-1]).all(axis=1).sum())
+            self.last_sample = values[-1]
+
+        if seq is not None:
+            if self.next_seq is not None:
+                skip = (seq - self.next_seq) % SEQ_MODULO
+                if skip < SEQ_MODULO // 2:
+                    self.dropped += skip
+                else:
+                    self.duplicated += SEQ_MODULO - skip
+            self.next_seq = (seq + n) % SEQ_MODULO
+
+        if self.last_time is not None:
+            block_span = float(times[-1]) - self.last_time
+            intervals = np.diff(times, prepend=self.last_time)
+            if block_span > 0:
+                rate = n / block_span
+                a = self.rate_alpha
+                self.recent_rate = rate if self.recent_rate is None else (1 - a) * self.recent_rate + a * rate
+        else:
+            intervals = np.diff(times)
+        if self.segment_start is None:
+            self.segment_start = float(times[0])
+        self.last_time = float(times[-1])
+        self.samples += n
+        self.segment_samples += n
+
+        if len(intervals):
+            self._add_intervals(intervals)
+
+    def _close_segment(self):
+        """
+        Add the current segment to the totals of finished segments.
+        """
+        if self.segment_start is not None:
+            span = self.last_time - self.segment_start
+            self.closed_span += span
+            self.closed_intervals += self.segment_samples - 1
+            self.closed_expected += span * self.rate_hz
+        self.segment_start = None
+        self.segment_samples = 0
+        self.last_time = None
+
+    def _add_intervals(self, intervals):
+        """
+        Merge a block of intervals into the histogram, counters and running moments.
+        """
+        period = 1.0 / self.rate_hz
+        rel = intervals / period
+        bins = np.searchsorted(INTERVAL_EDGES, rel, side='right') - 1
+        self.histogram += np.bincount(np.clip(bins, 0, len(self.histogram) - 1), minlength=len(self.histogram))
+
+        gaps = rel > self.gap_factor
+        if gaps.any():
+            self.gaps += int(gaps.sum())
+            self.gap_time += float(intervals[gaps].sum() - gaps.sum() * period)
+            self.missing_samples += int(np.round(rel[gaps]).sum() - gaps.sum())
+        self.bursts += int((rel < self.burst_factor).sum())
+
+        # Chan's parallel update of the interval mean and variance
+        n_b = len(intervals)
+        mean_b = float(intervals.mean())
+        m2_b = float(((intervals - mean_b) ** 2).sum())
+        n_a = self.intervals
+        total = n_a + n_b
+        delta = mean_b - self.interval_mean
+        self.interval_mean += delta * n_b / total
+        self.interval_m2 += m2_b + delta * delta * n_a * n_b / total
+        self.intervals = total
+
+    def interval_percentile(self, q: float) -> float:
+        """
+        Estimate an interval percentile from the histogram.
+
+        Parameters:
+            q (float): Percentile between 0 and 100.
+
+        Returns:
+            float: Upper edge of the bin holding the percentile, in sample periods,
+            or None before the first interval.
+        """
+        total = self.histogram.sum()
+        if total == 0:
+            return None
+        idx = int(np.searchsorted(np.cumsum(self.histogram), total * q / 100.0))
+        return float(INTERVAL_EDGES[min(idx + 1, len(INTERVAL_EDGES) - 1)])
+
+    def summary(self) -> dict:
+        """
+        Return the current statistics as a JSON-serializable dictionary.
+        """
+        span, intervals, expected = self.closed_span, self.closed_intervals, self.closed_expected
+        if self.segment_start is not None:
+            segment_span = self.last_time - self.segment_start
+            span += segment_span
+            intervals += self.segment_samples - 1
+            expected += segment_span * self.rate_hz
+        effective = intervals / span if span > 0 else None
+        jitter = (self.interval_m2 / self.intervals) ** 0.5 if self.intervals else None
+        return {
+            'configured_rate_hz': self.rate_hz,
+            'effective_rate_hz': effective,
+            'recent_rate_hz': self.recent_rate,
+            'rate_ratio': intervals / expected if expected > 0 else None,
+            'samples': self.samples,
+            'duration_s': span,
+            'interval_mean_s': self.interval_mean if self.intervals else None,
+            'interval_jitter_s': jitter,
+            'interval_p50_periods': self.interval_percentile(50),
+            'interval_p99_periods': self.interval_percentile(99),
+            'interval_histogram': {
+                # The last bin is open-ended
+                'edges_periods': [float(e) for e in INTERVAL_EDGES[:-1]],
+                'counts': [int(c) for c in self.histogram]
+            },
+            'gaps': self.gaps,
+            'gap_time_s': self.gap_time,
+            'missing_samples': self.missing_samples,
+            'bursts': self.bursts,
+            'dropped': self.dropped,
+            'duplicated': self.duplicated,
+            'repeated': self.repeated
+        }
+
+    def status_text(self) -> str:
+        """
+        Return a one-line summary for display in the UI.
+        """
+        rate = self.recent_rate
+        rate_text = f'{rate:.1f}' if rate is not None else '-'
+        jitter = (self.interval_m2 / self.intervals) ** 0.5 * 1000 if self.intervals else 0.0
+        return (f'Rate: {rate_text} / {self.rate_hz:g} Hz | Jitter: {jitter:.2f} ms | '
+                f'Gaps: {self.gaps} ({self.missing_samples} samples) | Bursts: {self.bursts} | '
+                f'Dropped: {self.dropped} | Duplicated: {self.duplicated} | Repeated: {self.repeated}')